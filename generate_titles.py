@@ -1,43 +1,14 @@
 #!/usr/bin/env python3
 
 import os
-import subprocess
+import argparse
 import json
 import re
+from whisper_worker import transcribe_clips, cached_transcript
 
 WHISPER_BIN = os.path.expanduser("~/whisper.cpp/build/bin/whisper-cli")
 WHISPER_MODEL = os.path.expanduser("~/whisper.cpp/models/ggml-base.bin")
 
-def extract_audio_snippet(video_path, wav_path):
-    try:
-        subprocess.run([
-            "ffmpeg", "-i", video_path,
-            "-t", "10", "-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1",
-            wav_path, "-y"
-        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        return os.path.exists(wav_path)
-    except Exception as e:
-        print(f"[!] ffmpeg error: {e}")
-        return False
-
-def whisper_transcribe(wav_path):
-    try:
-        subprocess.run([
-            WHISPER_BIN,
-            "-m", WHISPER_MODEL,
-            "-f", wav_path,
-            "-otxt",
-            "-of", wav_path[:-4]
-        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-        txt_path = wav_path[:-4] + ".txt"
-        if os.path.exists(txt_path):
-            with open(txt_path, "r") as f:
-                return f.read().strip()
-    except Exception as e:
-        print(f"[!] Whisper error: {e}")
-    return ""
-
 def is_valid_whisper(text):
     if not text or len(text) < 8:
         return False
@@ -58,28 +29,33 @@ def fallback_title(filename):
     else:
         return name.replace("_", " ").title()
 
-def generate_titles(folder_path):
+def generate_titles(folder_path, batch_size=1, extractors=2, whisper_workers=1, whisper_threads=None,
+                    incremental=False, vad=False, use_sources=False):
     print(f"[+] Scanning folder: {folder_path}")
+    out_path = os.path.join(folder_path, "titles.json")
     titles = {}
     whisper_fail_log = []
 
-    for file in os.listdir(folder_path):
-        if not file.lower().endswith(".mp4"):
-            continue
+    # Hidden files are renders in progress or analysis proxies
+    files = [file for file in os.listdir(folder_path) if file.lower().endswith(".mp4") and not file.startswith(".")]
 
-        video_path = os.path.join(folder_path, file)
-        base = os.path.splitext(file)[0]
-        tmp_wav = os.path.join(folder_path, f"{base}_tmp.wav")
+    # Keep the titles of clips that are unchanged since the last run
+    if incremental and os.path.exists(out_path):
+        with open(out_path, "r") as f:
+            titles = json.load(f)
+        files = [file for file in files if file not in titles
+                 or cached_transcript(os.path.join(folder_path, file), WHISPER_MODEL, vad, use_sources) is None]
+        print(f"[+] Incremental: {len(titles)} existing titles, {len(files)} new or changed clips")
 
-        print(f"    → Processing: {file}")
+    transcripts = transcribe_clips(folder_path, files, WHISPER_BIN, WHISPER_MODEL, batch_size=batch_size,
+                                   extractors=extractors, whisper_workers=whisper_workers,
+                                   whisper_threads=whisper_threads, vad=vad, use_sources=use_sources)
 
-        if extract_audio_snippet(video_path, tmp_wav):
-            text = whisper_transcribe(tmp_wav)
-            os.remove(tmp_wav)
-            txt_output = tmp_wav.replace(".wav", ".txt")
-            if os.path.exists(txt_output):
-                os.remove(txt_output)
+    for file in files:
+        print(f"    → Processing: {file}")
+        text = transcripts.get(file)
 
+        if text is not None:
             if is_valid_whisper(text):
                 title = text.splitlines()[0].strip().title()
                 print(f"      ↪ Whisper Title: {title}")
@@ -95,10 +71,11 @@ def generate_titles(folder_path):
 
         titles[file] = title
 
-    # Save titles
-    out_path = os.path.join(folder_path, "titles.json")
-    with open(out_path, "w") as f:
+    # Save titles atomically so a crash never leaves a half-written file
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "w") as f:
         json.dump(titles, f, indent=2)
+    os.replace(tmp_path, out_path)
     print(f"[✓] Titles saved: {out_path}")
 
     # Save Whisper failures
@@ -109,12 +86,25 @@ def generate_titles(folder_path):
         print(f"[!] Issues logged to: {fail_log}")
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) < 2:
-        print("Usage: python generate_titles_whisper.py /path/to/Shorts/JRE")
-        exit(1)
-    folder = sys.argv[1]
-    if not os.path.exists(folder):
-        print(f"[!] Folder not found: {folder}")
+    parser = argparse.ArgumentParser(description="Generate titles for a folder of shorts with whisper.cpp.")
+    parser.add_argument("folder", help="Folder containing the .mp4 clips, e.g. /path/to/Shorts/JRE")
+    parser.add_argument("--batch", type=int, default=1,
+                        help="Transcribe this many clips per whisper run (1 transcribes clips one by one).")
+    parser.add_argument("--extractors", type=int, default=2, help="Parallel ffmpeg snippet extractors.")
+    parser.add_argument("--whisper_workers", type=int, default=1, help="Parallel whisper processes.")
+    parser.add_argument("--whisper_threads", type=int, default=None,
+                        help="Threads per whisper process (workers x threads is capped at the core count).")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Keep existing titles.json entries and only process new or changed clips.")
+    parser.add_argument("--vad", action="store_true",
+                        help="Transcribe the first stretch of dense speech instead of the opening 10 seconds.")
+    parser.add_argument("--from_sources", action="store_true",
+                        help="Transcribe each source listed in clips_manifest.json once and slice it per clip.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.folder):
+        print(f"[!] Folder not found: {args.folder}")
         exit(1)
-    generate_titles(folder)
\ No newline at end of file
+    generate_titles(args.folder, batch_size=args.batch, extractors=args.extractors,
+                    whisper_workers=args.whisper_workers, whisper_threads=args.whisper_threads,
+                    incremental=args.incremental, vad=args.vad, use_sources=args.from_sources)
\ No newline at end of file
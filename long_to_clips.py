@@ -1,10 +1,28 @@
 import os
+import csv
+import json
+import fcntl
 import logging
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import cv2
+import numpy as np
 import yt_dlp
 import argparse
+import math
 import random
+import bisect
+import statistics
+from collections import deque
 from moviepy import VideoFileClip, vfx
+from media_cache import file_fingerprint, cache_key, cache_load, cache_store, cache_clear
+from media_probe import probe, ffprobe_json, keyframe_times
 
 # ANSI escape codes for colored output
 class Color:
@@ -14,45 +32,229 @@ class Color:
     RESET = "\033[0m"  # Reset to default
 
 
+SCENE_CACHE = "scenes"
+# Sidecar manifest mapping each clip to the source it was cut from
+MANIFEST_FILE = "clips_manifest.json"
+# Shorts are rendered here and moved into place once complete
+RENDER_DIR = ".rendering"
+AUDIO_RATE = 16000
+# Analysis proxy: frame width and frame rate
+PROXY_WIDTH = 160
+PROXY_FPS = 10
+# Encoder, intermediate container and extra arguments used to re-encode boundary GOPs.
+# H.264/HEVC pieces go through MPEG-TS so every piece carries its own in-band parameter sets.
+SMART_ENCODERS = {
+    "h264": ("libx264", ".ts", []),
+    "hevc": ("libx265", ".ts", ["-x265-params", "repeat-headers=1"]),
+    "vp9": ("libvpx-vp9", ".mkv", ["-deadline", "good", "-cpu-used", "5", "-row-mt", "1"]),
+}
+H264_PROFILES = {"constrained baseline": "baseline", "baseline": "baseline", "main": "main", "high": "high",
+                 "high 10": "high10", "high 4:2:2": "high422", "high 4:4:4 predictive": "high444"}
+HEVC_PROFILES = {"main": "main", "main 10": "main10"}
+
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-def download_video(url):
-    """Download video using yt_dlp."""
+def download_video(url, output_dir='.', fragments=1, budget=None):
+    """Download video using yt_dlp, fetching up to `fragments` fragments at once.
+
+    With a DiskBudget, the download reserves its estimated size before
+    writing and pauses whenever free space drops below the budget's floor.
+    """
     logging.info(f"{Color.INFO}Downloading video from URL: {url}{Color.RESET}")
     ydl_opts = {
         'format': 'bestvideo[ext=webm]+bestaudio/best[ext=webm]',
-        'outtmpl': '%(title)s.%(ext)s',
-        'noplaylist': True
+        'outtmpl': os.path.join(output_dir, '%(title)s.%(ext)s'),
+        'noplaylist': True,
+        'concurrent_fragment_downloads': fragments
     }
+    if budget:
+        ydl_opts['progress_hooks'] = [lambda status: budget.progress(url, status)]
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             info_dict = ydl.extract_info(url, download=True)
             video_title = info_dict.get('title', None)
-            video_file = f"{video_title}.webm"
+            video_file = os.path.normpath(os.path.join(output_dir, f"{video_title}.webm"))
             logging.info(f"{Color.INFO}Downloaded: {video_file}{Color.RESET}")
             return video_file
     except Exception as e:
         logging.error(f"{Color.ERROR}Error downloading video: {e}{Color.RESET}")
         return None
+    finally:
+        if budget:
+            budget.release(url)
+
+
+def estimated_download_size(info_dict):
+    """Bytes a download will occupy at its peak, from yt-dlp's filesize or filesize_approx; 0 if unknown."""
+    formats = info_dict.get('requested_formats') or [info_dict]
+    size = sum(f.get('filesize') or f.get('filesize_approx') or 0 for f in formats)
+    # Merging writes the joined file while the separate streams are still on disk
+    return size * 2 if len(formats) > 1 else size
+
+
+class DiskBudget:
+    """Shares free disk space between concurrent downloads.
+
+    A download is admitted once free space, less what admitted downloads
+    still have to write, covers its estimated size plus min_free_bytes.
+    An admitted download pauses whenever free space falls below
+    min_free_bytes. Both checks run in yt-dlp progress hooks, so they also
+    hold back transfers already in flight.
+    """
+
+    def __init__(self, path, min_free_bytes, poll=30):
+        self.path = path
+        self.min_free_bytes = min_free_bytes
+        self.poll = poll
+        self.lock = threading.Lock()
+        self.downloads = {}  # key -> {"estimate": bytes, "written": {filename: bytes}}
+
+    def _remaining(self, entry):
+        return max(0, entry["estimate"] - sum(entry["written"].values()))
+
+    def _free(self):
+        return shutil.disk_usage(self.path).free
+
+    def progress(self, key, status):
+        if status.get('status') != 'downloading':
+            return
+        with self.lock:
+            entry = self.downloads.get(key)
+            if entry is not None:
+                entry["written"][status.get('filename')] = status.get('downloaded_bytes') or 0
+        if entry is None:
+            self._admit(key, status)
+            return
+        while self._free() < self.min_free_bytes:
+            free_gb = self._free() / 1024 ** 3
+            logging.warning(f"{Color.WARNING}Only {free_gb:.1f} GB free, pausing download...{Color.RESET}")
+            time.sleep(self.poll)
+
+    def _admit(self, key, status):
+        estimate = estimated_download_size(status.get('info_dict') or {})
+        if not estimate:
+            estimate = status.get('total_bytes') or status.get('total_bytes_estimate') or 0
+        while True:
+            with self.lock:
+                reserved = sum(self._remaining(entry) for entry in self.downloads.values())
+                free = self._free()
+                if free - reserved - estimate >= self.min_free_bytes:
+                    self.downloads[key] = {
+                        "estimate": estimate,
+                        "written": {status.get('filename'): status.get('downloaded_bytes') or 0},
+                    }
+                    return
+            logging.warning(
+                f"{Color.WARNING}Waiting for disk space: {free / 1024 ** 3:.1f} GB free, {reserved / 1024 ** 3:.1f} GB "
+                f"reserved, {estimate / 1024 ** 3:.1f} GB needed{Color.RESET}")
+            time.sleep(self.poll)
 
+    def release(self, key):
+        with self.lock:
+            self.downloads.pop(key, None)
 
-def debug_video_properties(video_file):
-    """Log properties of the video."""
+
+def download_and_split(video_urls, downloads=2, fragments=4, min_free_gb=2, copy=False, exact=False,
+                       workers=1, threads=None):
+    """Download several videos at once and split each one as soon as its download finishes.
+
+    Finished downloads wait in a queue bounded to `downloads` entries, so
+    downloaders stall when splitting falls behind. Downloads share a
+    DiskBudget, so together they never write past min_free_gb of free space.
+    """
+    pending = queue.Queue()
+    for url in video_urls:
+        pending.put(url)
+    handoff = queue.Queue(maxsize=downloads)
+    budget = DiskBudget('.', min_free_gb * 1024 ** 3)
+
+    def downloader():
+        while True:
+            try:
+                url = pending.get_nowait()
+            except queue.Empty:
+                return
+            video_file = None
+            try:
+                video_file = download_video(url, fragments=fragments, budget=budget)
+            finally:
+                handoff.put(video_file)
+
+    downloaders = [threading.Thread(target=downloader, daemon=True) for _ in range(min(downloads, len(video_urls)))]
+    for thread in downloaders:
+        thread.start()
+
+    # Every URL hands off exactly one result, None for a failed download
+    for _ in video_urls:
+        video_file = handoff.get()
+        if video_file:
+            debug_video_properties(video_file)
+            split_video(video_file, copy=copy, exact=exact, workers=workers, threads=threads)
+
+    for thread in downloaders:
+        thread.join()
+
+
+def debug_video_properties(video_file, proxy=None):
+    """Log properties of the video, from the analysis proxy metadata when one is given."""
+    if proxy:
+        source = proxy["source"]
+        logging.info(
+            f"{Color.INFO}Video Properties - Duration: {source['duration']:.2f} seconds, Resolution: {source['size']}, FPS: {source['fps']}{Color.RESET}")
+        return
     try:
-        with VideoFileClip(video_file) as clip:
-            duration = clip.duration
-            fps = clip.fps
-            resolution = clip.size
-            logging.info(
-                f"{Color.INFO}Video Properties - Duration: {duration:.2f} seconds, Resolution: {resolution}, FPS: {fps}{Color.RESET}")
+        meta = probe(video_file)
+        logging.info(
+            f"{Color.INFO}Video Properties - Duration: {meta['duration']:.2f} seconds, Resolution: {meta['size']}, "
+            f"FPS: {meta['fps']}, Codec: {meta['video_codec']}{Color.RESET}")
     except Exception as e:
         logging.error(f"{Color.ERROR}Error retrieving properties for {video_file}: {e}{Color.RESET}")
 
 
-def split_video(video_file, max_duration=600):
-    """Split the video into sections no longer than max_duration."""
+def record_manifest(clip_file, source_file, start_time, end_time, manifest_path=MANIFEST_FILE):
+    """Record in the sidecar manifest which source a clip was cut from, and where.
+
+    The read-modify-write holds an exclusive lock on a sidecar lock file, so
+    several processes cutting clips into one folder never drop entries.
+    """
+    with open(manifest_path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = {}
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, "r") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"{Color.WARNING}Could not read {manifest_path}, starting a new one: {e}{Color.RESET}")
+        # Sources in other folders are stored relative to the manifest so the chain stays resolvable
+        source = os.path.relpath(os.path.abspath(source_file), os.path.dirname(os.path.abspath(manifest_path)))
+        manifest[os.path.basename(clip_file)] = {
+            "source": source,
+            "start": round(float(start_time), 3),
+            "end": round(float(end_time), 3),
+        }
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+
+def split_video(video_file, max_duration=600, copy=False, exact=False, workers=1, threads=None):
+    """Split the video into sections no longer than max_duration.
+
+    With copy=True the video is cut on keyframes without re-encoding, so the
+    segments may run slightly past max_duration. Passing exact=True as well
+    falls back to re-encoding to hit the requested boundaries. With
+    workers > 1 re-encoded segments are rendered in parallel processes.
+    """
+    if copy and not exact:
+        return split_video_copy(video_file, max_duration)
+    if workers > 1:
+        return split_video_parallel(video_file, max_duration, workers, threads)
+
     clips_created = []
     try:
         with VideoFileClip(video_file) as clip:
@@ -81,6 +283,7 @@ def split_video(video_file, max_duration=600):
                     logging.info(
                         f"{Color.INFO}Created segment: {output_file} from {start_time} to {end_time}{Color.RESET}")
                     clips_created.append(output_file)
+                    record_manifest(output_file, video_file, start_time, end_time)
                 except Exception as e:
                     logging.error(f"{Color.ERROR}Error creating segment {output_file}: {e}{Color.RESET}")
 
@@ -93,6 +296,164 @@ def split_video(video_file, max_duration=600):
     return clips_created
 
 
+def split_video_copy(video_file, max_duration=600):
+    """Split the video on keyframes with ffmpeg's segment muxer, without re-encoding."""
+    clips_created = []
+    video_title = os.path.splitext(os.path.basename(video_file))[0]
+    output_pattern = f"{video_title}_part_%d.mp4"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        segment_list = os.path.join(tmp_dir, "segments.csv")
+        try:
+            result = subprocess.run([
+                "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                "-i", video_file,
+                "-map", "0:v:0", "-map", "0:a?",
+                "-c", "copy",
+                "-f", "segment",
+                "-segment_time", str(max_duration),
+                "-segment_list", segment_list,
+                "-segment_list_type", "csv",
+                "-reset_timestamps", "1",
+                output_pattern
+            ], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        except Exception as e:
+            logging.error(f"{Color.ERROR}Error running ffmpeg on {video_file}: {e}{Color.RESET}")
+            return clips_created
+
+        if result.returncode != 0:
+            logging.error(f"{Color.ERROR}Error splitting video {video_file}: {result.stderr.strip()}{Color.RESET}")
+            return clips_created
+
+        # The segment list holds the real cut points, which land on keyframes
+        with open(segment_list, newline='') as f:
+            for row in csv.reader(f):
+                if len(row) < 3:
+                    continue
+                output_file, start_time, end_time = row[0], float(row[1]), float(row[2])
+                logging.info(
+                    f"{Color.INFO}Created segment: {output_file} from {start_time:.3f} to {end_time:.3f} (keyframe cut){Color.RESET}")
+                clips_created.append(output_file)
+                record_manifest(output_file, video_file, start_time, end_time)
+
+    return clips_created
+
+
+def _encode_segment(video_file, start_time, end_time, output_file, threads):
+    """Encode one segment with its own ffmpeg process, capped at `threads` threads."""
+    result = subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-ss', f"{start_time:.6f}", '-t', f"{end_time - start_time:.6f}", '-i', video_file,
+        '-c:v', 'libx264', '-c:a', 'aac', '-threads', str(threads),
+        output_file
+    ], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffmpeg exited with code {result.returncode}")
+    return output_file
+
+
+def split_video_parallel(video_file, max_duration=600, workers=2, threads=None):
+    """Split the video by re-encoding each segment as an independent ffmpeg job."""
+    clips_created = []
+    if threads is None:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+
+    try:
+        total_duration = probe(video_file)["duration"]
+    except Exception as e:
+        logging.error(f"{Color.ERROR}Error splitting video {video_file}: {e}{Color.RESET}")
+        return clips_created
+
+    logging.info(f"{Color.INFO}Total duration of video: {total_duration:.2f} seconds{Color.RESET}")
+    logging.info(f"{Color.INFO}Encoding with {workers} workers, {threads} encoder threads each{Color.RESET}")
+
+    video_title = os.path.splitext(os.path.basename(video_file))[0]
+    jobs = []
+    start_time = 0
+    clip_count = 0
+    while start_time < total_duration:
+        end_time = min(start_time + max_duration, total_duration)
+        jobs.append((start_time, end_time, f"{video_title}_part_{clip_count}.mp4"))
+        start_time += max_duration
+        clip_count += 1
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_encode_segment, video_file, start_time, end_time, output_file, threads)
+            for start_time, end_time, output_file in jobs
+        ]
+        # Report in segment order, whatever order the workers finish in
+        for (start_time, end_time, output_file), future in zip(jobs, futures):
+            try:
+                future.result()
+                logging.info(
+                    f"{Color.INFO}Created segment: {output_file} from {start_time} to {end_time}{Color.RESET}")
+                clips_created.append(output_file)
+                record_manifest(output_file, video_file, start_time, end_time)
+            except Exception as e:
+                logging.error(f"{Color.ERROR}Error creating segment {output_file}: {e}{Color.RESET}")
+
+    return clips_created
+
+
+def proxy_paths(video_file):
+    """Return the paths of the analysis proxy files kept next to video_file."""
+    base = os.path.join(os.path.dirname(video_file), f".{os.path.basename(video_file)}.proxy")
+    return {"video": f"{base}.mp4", "audio": f"{base}.wav", "meta": f"{base}.json"}
+
+
+def build_analysis_proxy(video_file, width=PROXY_WIDTH, fps=PROXY_FPS):
+    """Return the analysis proxy for video_file, creating it if it is missing or stale.
+
+    The proxy is a small, low-fps grayscale video plus a 16 kHz mono WAV,
+    written in a single decode of the source. Proxy frames start at t=0 at a
+    constant rate, so frame N maps to source time N / fps. The returned
+    metadata also records the source's duration, size and frame rate.
+    """
+    paths = proxy_paths(video_file)
+    fingerprint = file_fingerprint(video_file)
+    try:
+        with open(paths["meta"], "r") as f:
+            meta = json.load(f)
+        if (meta.get("fingerprint") == fingerprint and meta.get("width") == width and meta.get("fps") == fps
+                and os.path.exists(paths["video"])):
+            return meta
+    except (OSError, ValueError):
+        pass
+
+    logging.info(f"{Color.INFO}Building analysis proxy for: {video_file}{Color.RESET}")
+    source = probe(video_file)
+    has_audio = source["audio"] is not None
+
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", video_file,
+        "-map", "0:v:0", "-an",
+        "-vf", f"fps={fps}:start_time=0,scale={width}:-2,format=gray,format=yuv420p",
+        "-c:v", "libx264", "-preset", "ultrafast", "-crf", "28", paths["video"]
+    ]
+    if has_audio:
+        command += ["-map", "0:a:0", "-vn", "-ac", "1", "-ar", str(AUDIO_RATE), "-c:a", "pcm_s16le", paths["audio"]]
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Could not build proxy for {video_file}: {result.stderr.strip()}")
+
+    meta = {
+        "fingerprint": fingerprint,
+        "width": width,
+        "fps": fps,
+        "video": paths["video"],
+        "audio": paths["audio"] if has_audio else None,
+        "source": {
+            "duration": source["duration"],
+            "size": source["size"],
+            "fps": source["fps"],
+        },
+    }
+    with open(paths["meta"], "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
 def detect_scenes(video_file):
     """Detect scenes in the video using OpenCV."""
     logging.info(f"{Color.INFO}Detecting scenes in: {video_file}{Color.RESET}")
@@ -128,86 +489,737 @@ def detect_scenes(video_file):
     return scenes
 
 
-def create_shorts_from_segments(min_duration=25, max_duration=60, min_clips=4, max_clips=10):
-    """Create YouTube Shorts from video files in the current directory."""
+def _analysis_frame(frame, width):
+    """Shrink a BGR frame to `width` pixels wide and convert it to grayscale."""
+    height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+    small = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+def _seek_frame(cap, target):
+    """Seek to frame `target` and return the index of the frame the next read returns.
+
+    OpenCV seeks are inexact for many VP9 and B-frame files, so the position
+    is read back rather than assumed. An overshoot is retried from further
+    back, and the gap to `target` is then closed by grabbing frames.
+    """
+    back_off = 0
+    while True:
+        request = max(0, target - back_off)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, request)
+        position = int(round(cap.get(cv2.CAP_PROP_POS_FRAMES)))
+        if position <= target or request == 0:
+            break
+        back_off = back_off * 2 or 16
+    while position < target and cap.grab():
+        position += 1
+    return position
+
+
+def _frame_differences(video_file, start_frame=0, end_frame=None, width=160, frame_step=2):
+    """Return (frame_index, difference) pairs for the sampled frames in [start_frame, end_frame).
+
+    Only every frame_step-th frame is decoded; the others are grabbed and
+    skipped. Each sample is compared with the previous one by mean absolute
+    difference on a downscaled grayscale frame, which does not depend on the
+    source resolution. A range starting past zero first reads the sample just
+    before it, so a cut on the range boundary is still seen.
+    """
+    cap = cv2.VideoCapture(video_file)
+    diffs = []
+    frame_index = max(0, start_frame - frame_step)
+    if frame_index:
+        frame_index = _seek_frame(cap, frame_index)
+    prev_gray = None
+
+    while end_frame is None or frame_index < end_frame:
+        if frame_index % frame_step:
+            # Skipped frames are demuxed but never converted to pixels
+            if not cap.grab():
+                break
+        else:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            gray = _analysis_frame(frame, width)
+            if prev_gray is not None:
+                diffs.append((frame_index, cv2.mean(cv2.absdiff(prev_gray, gray))[0]))
+            prev_gray = gray
+        frame_index += 1
+
+    cap.release()
+    return diffs
+
+
+def _pick_scene_cuts(diffs, fps, threshold=None, sensitivity=3.0, min_threshold=12.0, window=30,
+                     min_scene_len=0.5):
+    """Turn (frame_index, difference) pairs into scene cut timestamps.
+
+    A cut is reported when the difference exceeds `threshold`, or when no
+    fixed threshold is given, the mean of the last `window` differences plus
+    `sensitivity` standard deviations (but never less than `min_threshold`).
+    """
+    scenes = []
+    recent = deque(maxlen=window)
+
+    for frame_index, diff in diffs:
+        if threshold is not None:
+            limit = threshold
+        elif len(recent) >= 2:
+            limit = max(min_threshold, statistics.fmean(recent) + sensitivity * statistics.pstdev(recent))
+        else:
+            limit = min_threshold
+
+        timestamp = frame_index / fps
+        if diff > limit:
+            if not scenes or timestamp - scenes[-1] >= min_scene_len:
+                scenes.append(timestamp)
+        else:
+            # Keep cuts out of the baseline so one cut does not mask the next
+            recent.append(diff)
+
+    return scenes
+
+
+def _open_for_scenes(video_file):
+    """Return (fps, frame_count) for scene detection, or None if the video cannot be read."""
+    cap = cv2.VideoCapture(video_file)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    opened = cap.isOpened()
+    cap.release()
+    if not opened or not fps or fps <= 0:
+        logging.warning(f"{Color.WARNING}Failed to read video: {video_file}{Color.RESET}")
+        return None
+    return fps, frame_count
+
+
+def detect_scenes_fast(video_file, width=160, frame_step=2, **cut_params):
+    """Detect scene cuts on downscaled, sampled frames and return their timestamps in seconds."""
+    logging.info(f"{Color.INFO}Detecting scenes (fast) in: {video_file}{Color.RESET}")
+    opened = _open_for_scenes(video_file)
+    if opened is None:
+        return []
+
+    fps, _ = opened
+    diffs = _frame_differences(video_file, width=width, frame_step=max(1, int(frame_step)))
+    scenes = _pick_scene_cuts(diffs, fps, **cut_params)
+    logging.info(f"{Color.INFO}Detected {len(scenes)} scenes in the video.{Color.RESET}")
+    return scenes
+
+
+def detect_scenes_chunked(video_file, workers=None, chunks=None, width=160, frame_step=2, **cut_params):
+    """Detect scene cuts like detect_scenes_fast, with the timeline split across worker processes.
+
+    Each worker seeks to the start of its range, confirms where it landed
+    and measures frame differences there; the differences are stitched back
+    in order and the cut decision runs once over the whole timeline, so the
+    result matches the sequential detector. The frame count is only an
+    estimate for some containers, so the last range reads to the real end
+    of the stream and ranges past the end come back empty.
+    """
+    logging.info(f"{Color.INFO}Detecting scenes (chunked) in: {video_file}{Color.RESET}")
+    opened = _open_for_scenes(video_file)
+    if opened is None:
+        return []
+
+    fps, frame_count = opened
+    frame_step = max(1, int(frame_step))
+    workers = workers or os.cpu_count() or 1
+    chunks = chunks or workers
+
+    # Range starts are aligned to frame_step so every worker samples the same frames
+    chunk_len = max(frame_step, math.ceil(frame_count / chunks / frame_step) * frame_step)
+    starts = list(range(0, max(frame_count, 1), chunk_len))
+    ends = starts[1:] + [None]  # The last range reads to the real end of the stream
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_frame_differences, video_file, start, end, width, frame_step)
+            for start, end in zip(starts, ends)
+        ]
+        diffs = [diff for future in futures for diff in future.result()]
+
+    scenes = _pick_scene_cuts(diffs, fps, **cut_params)
+    logging.info(
+        f"{Color.INFO}Detected {len(scenes)} scenes in the video across {len(starts)} ranges.{Color.RESET}")
+    return scenes
+
+
+def _refine_cut(video_file, fps, cut_time, window=0.5, threshold=12.0):
+    """Decode only `window` seconds either side of a candidate cut and return the exact cut time, or None."""
+    start_frame = max(0, int((cut_time - window) * fps))
+    end_frame = int((cut_time + window) * fps) + 1
+    diffs = _frame_differences(video_file, start_frame, end_frame, frame_step=1)
+    if not diffs:
+        return None
+    frame_index, diff = max(diffs, key=lambda item: item[1])
+    return frame_index / fps if diff > threshold else None
+
+
+def detect_scenes_compressed(video_file, window=25, spike_ratio=3.0, min_scene_len=0.5, refine=False,
+                             refine_window=0.5):
+    """Estimate scene cuts from the video bitstream alone, without decoding any pixels.
+
+    Encoders insert extra keyframes at scene changes, so a keyframe arriving
+    well before the regular GOP interval is taken as a cut, as is an
+    inter-frame packet several times larger than the median of its
+    neighbours. With refine=True each candidate is confirmed and placed
+    exactly by decoding only refine_window seconds around it.
+    """
+    logging.info(f"{Color.INFO}Detecting scenes (compressed) in: {video_file}{Color.RESET}")
+    data = ffprobe_json(video_file, ["-select_streams", "v:0", "-show_entries", "packet=pts_time,size,flags"])
+    packets = sorted(
+        (float(p["pts_time"]), int(p["size"]), "K" in p.get("flags", ""))
+        for p in data.get("packets", []) if p.get("pts_time") not in (None, "N/A")
+    )
+    if len(packets) < 2:
+        logging.warning(f"{Color.WARNING}Failed to read video: {video_file}{Color.RESET}")
+        return []
+
+    times = np.array([p[0] for p in packets])
+    sizes = np.array([p[1] for p in packets], dtype=np.float64)
+    keys = np.array([p[2] for p in packets])
+
+    candidates = []
+    key_times = times[keys]
+    if len(key_times) > 2:
+        gaps = np.diff(key_times)
+        typical_gop = np.median(gaps)
+        candidates += key_times[1:][gaps < 0.9 * typical_gop].tolist()
+
+    if len(sizes) > window:
+        # Median size of the surrounding packets, keyframes excluded
+        inter_sizes = np.where(keys, np.nan, sizes)
+        half = window // 2
+        padded = np.pad(inter_sizes, (half, window - half - 1), mode="edge")
+        local_median = np.nanmedian(np.lib.stride_tricks.sliding_window_view(padded, window), axis=1)
+        spikes = ~keys & (sizes > spike_ratio * np.nan_to_num(local_median, nan=np.inf))
+        candidates += times[spikes].tolist()
+
+    if refine:
+        opened = _open_for_scenes(video_file)
+        if opened is None:
+            return []
+        fps, _ = opened
+        candidates = [t for t in (_refine_cut(video_file, fps, c, refine_window) for c in candidates) if t is not None]
+
+    scenes = []
+    for cut_time in sorted(candidates):
+        if not scenes or cut_time - scenes[-1] >= min_scene_len:
+            scenes.append(cut_time)
+    logging.info(f"{Color.INFO}Detected {len(scenes)} scenes in the video.{Color.RESET}")
+    return scenes
+
+
+def _run_scene_detector(video_file, detector, fps, workers, params, proxy=None):
+    if proxy and detector in ('fast', 'chunked'):
+        # The proxy is already small and low-fps, so every frame is sampled
+        video_file = proxy["video"]
+        params = {"frame_step": 1, **params}
+    if detector == 'classic':
+        if not fps:
+            cap = cv2.VideoCapture(video_file)
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            cap.release()
+        return [frame / fps for frame in detect_scenes(video_file)]
+    if detector == 'fast':
+        return detect_scenes_fast(video_file, **params)
+    if detector == 'chunked':
+        return detect_scenes_chunked(video_file, workers=workers, **params)
+    if detector == 'compressed':
+        return detect_scenes_compressed(video_file, **params)
+    raise ValueError(f"Unknown scene detector: {detector}")
+
+
+def detect_scene_times(video_file, detector='fast', fps=None, workers=None, params=None, use_cache=True,
+                       proxy=None):
+    """Return scene cut timestamps in seconds using the chosen detector.
+
+    Results are cached by file fingerprint and detector parameters, so a
+    re-run only decodes files that are new or have changed. When an analysis
+    proxy is given the fast detectors read it instead of the source.
+    """
+    params = params or {}
+    key = None
+    if use_cache:
+        # The chunked detector finds the same cuts as the fast one, so they share entries
+        cache_name = 'fast' if detector == 'chunked' else detector
+        proxy_params = {"proxy": [proxy["width"], proxy["fps"]]} if proxy and detector in ('fast', 'chunked') else {}
+        key = cache_key(file_fingerprint(video_file), detector=cache_name, **proxy_params, **params)
+        cached = cache_load(SCENE_CACHE, key)
+        if cached is not None:
+            logging.info(f"{Color.INFO}Using {len(cached)} cached scenes for: {video_file}{Color.RESET}")
+            return cached
+
+    scenes = _run_scene_detector(video_file, detector, fps, workers, params, proxy)
+    if key:
+        cache_store(SCENE_CACHE, key, scenes)
+    return scenes
+
+
+def candidate_intervals(scenes, min_duration=25, max_duration=60):
+    """Return (start, end) scene pairs lasting between min_duration and max_duration.
+
+    A single two-pointer pass over the sorted cut times pairs every start
+    with the earliest later cut that makes the clip long enough.
+    """
+    scenes = sorted(scenes)
+    candidates = []
+    end_index = 0
+    for start_index, start_time in enumerate(scenes):
+        end_index = max(end_index, start_index + 1)
+        while end_index < len(scenes) and scenes[end_index] - start_time < min_duration:
+            end_index += 1
+        if end_index == len(scenes):
+            break
+        if scenes[end_index] - start_time <= max_duration:
+            candidates.append((start_time, scenes[end_index]))
+    return candidates
+
+
+def _fits(chosen, interval):
+    """Check that an interval does not overlap any in the sorted `chosen` list."""
+    # chosen is kept sorted, so only the neighbours need checking
+    pos = bisect.bisect_left(chosen, interval)
+    if pos > 0 and chosen[pos - 1][1] > interval[0]:
+        return False
+    if pos < len(chosen) and interval[1] > chosen[pos][0]:
+        return False
+    return True
+
+
+def select_intervals(candidates, count, seed=None):
+    """Pick up to `count` non-overlapping intervals spread evenly across the timeline.
+
+    The timeline is divided into `count` equal buckets and each bucket
+    contributes the candidate nearest its centre (or a random one when a
+    seed is given); remaining slots are filled from whatever still fits.
+    """
+    if not candidates or count <= 0:
+        return []
+
+    rng = random.Random(seed) if seed is not None else None
+    candidates = sorted(candidates)
+    span_start = candidates[0][0]
+    span = max(candidates[-1][1] - span_start, 1e-9)
+    buckets = [[] for _ in range(count)]
+    for interval in candidates:
+        bucket = min(count - 1, int((interval[0] - span_start) / span * count))
+        buckets[bucket].append(interval)
+
+    chosen = []
+    for bucket_index, bucket in enumerate(buckets):
+        if not bucket:
+            continue
+        if rng:
+            ordered = rng.sample(bucket, len(bucket))
+        else:
+            centre = span_start + (bucket_index + 0.5) * span / count
+            ordered = sorted(bucket, key=lambda interval: abs((interval[0] + interval[1]) / 2 - centre))
+        for interval in ordered:
+            if _fits(chosen, interval):
+                bisect.insort(chosen, interval)
+                break
+
+    for interval in candidates:
+        if len(chosen) >= count:
+            break
+        if _fits(chosen, interval):
+            bisect.insort(chosen, interval)
+
+    return chosen
+
+
+def decode_audio_pcm(video_file, sample_rate=AUDIO_RATE, proxy=None):
+    """Decode the audio track once to mono float32 samples at sample_rate.
+
+    When an analysis proxy with audio is given, its 16 kHz WAV is read
+    directly instead of decoding the source again.
+    """
+    if proxy and proxy.get("audio") and sample_rate == AUDIO_RATE:
+        with wave.open(proxy["audio"], "rb") as wav:
+            return np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16).astype(np.float32) / 32768.0
+    try:
+        result = subprocess.run([
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-i", video_file,
+            "-vn", "-ac", "1", "-ar", str(sample_rate), "-f", "s16le", "-"
+        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except Exception as e:
+        logging.error(f"{Color.ERROR}Error running ffmpeg on {video_file}: {e}{Color.RESET}")
+        return None
+
+    if result.returncode != 0:
+        logging.error(f"{Color.ERROR}Error decoding audio from {video_file}: {result.stderr.decode().strip()}{Color.RESET}")
+        return None
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def audio_features(samples, sample_rate=AUDIO_RATE, window=0.5):
+    """Compute per-window loudness, speech and peak-burst features from PCM samples."""
+    window_len = int(sample_rate * window)
+    count = len(samples) // window_len
+    if count == 0:
+        empty = np.zeros(0)
+        return {"window": window, "level": empty, "speech": empty, "bursts": empty}
+
+    frames = samples[:count * window_len].reshape(count, window_len)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    loudness = 20 * np.log10(rms + 1e-6)
+    crossings = np.mean(np.abs(np.diff(np.signbit(frames).astype(np.int8), axis=1)), axis=1)
+
+    # Speech: clearly above the noise floor with a voice-like zero-crossing rate
+    noise_floor = np.percentile(loudness, 20)
+    speech = (loudness > noise_floor + 6) & (crossings > 0.02) & (crossings < 0.25)
+    # Bursts: laughter, shouting and other sudden peaks
+    bursts = loudness > np.mean(loudness) + 2 * np.std(loudness)
+
+    span = np.ptp(loudness)
+    level = (loudness - loudness.min()) / span if span > 0 else np.zeros_like(loudness)
+    return {"window": window, "level": level, "speech": speech, "bursts": bursts}
+
+
+def score_intervals(candidates, features, weights=(0.4, 0.4, 0.2)):
+    """Score (start, end) intervals by mean loudness, speech ratio and burst density."""
+    window = features["window"]
+    count = len(features["level"])
+    if not candidates or not count:
+        return np.zeros(len(candidates))
+
+    bounds = np.array(candidates, dtype=np.float64)
+    starts = np.clip((bounds[:, 0] / window).astype(np.int64), 0, count)
+    ends = np.clip((bounds[:, 1] / window).astype(np.int64), 0, count)
+    lengths = np.maximum(ends - starts, 1)
+
+    score = np.zeros(len(candidates))
+    for weight, name in zip(weights, ("level", "speech", "bursts")):
+        # Prefix sums give every interval's mean in O(1)
+        prefix = np.concatenate(([0.0], np.cumsum(features[name], dtype=np.float64)))
+        score += weight * (prefix[ends] - prefix[starts]) / lengths
+    return score
+
+
+def select_top_intervals(candidates, scores, count):
+    """Pick up to `count` non-overlapping intervals with the highest scores."""
+    chosen = []
+    for index in np.argsort(-np.asarray(scores), kind="stable"):
+        if len(chosen) >= count:
+            break
+        interval = candidates[index]
+        if _fits(chosen, interval):
+            bisect.insort(chosen, interval)
+    return chosen
+
+
+def render_shorts_ffmpeg(video_file, jobs, fade=1, has_audio=True, batch_size=6):
+    """Render (start, end, output_file) jobs with fades, decoding the source once per batch.
+
+    Each ffmpeg invocation seeks to the earliest start in its batch, splits
+    the decoded stream and trims one branch per output, so overlapping
+    decode work is shared instead of repeated for every short.
+    """
+    created = []
+    jobs = sorted(jobs)
+    for batch_start in range(0, len(jobs), batch_size):
+        batch = jobs[batch_start:batch_start + batch_size]
+        seek = batch[0][0]
+        until = max(end_time for _, end_time, _ in batch)
+        count = len(batch)
+
+        filters = [f"[0:v]split={count}" + "".join(f"[v{i}]" for i in range(count))]
+        if has_audio:
+            filters.append(f"[0:a]asplit={count}" + "".join(f"[a{i}]" for i in range(count)))
+        outputs = []
+        for i, (start_time, end_time, output_file) in enumerate(batch):
+            start, end = start_time - seek, end_time - seek
+            duration = end - start
+            filters.append(
+                f"[v{i}]trim=start={start:.3f}:end={end:.3f},setpts=PTS-STARTPTS,"
+                f"fade=t=in:st=0:d={fade},fade=t=out:st={max(0.0, duration - fade):.3f}:d={fade}[vo{i}]")
+            outputs += ["-map", f"[vo{i}]"]
+            if has_audio:
+                filters.append(f"[a{i}]atrim=start={start:.3f}:end={end:.3f},asetpts=PTS-STARTPTS[ao{i}]")
+                outputs += ["-map", f"[ao{i}]", "-c:a", "aac"]
+            outputs += ["-c:v", "libx264", output_file]
+
+        command = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-ss", f"{seek:.3f}", "-to", f"{until:.3f}", "-i", video_file,
+            "-filter_complex", ";".join(filters)
+        ] + outputs
+
+        started = time.monotonic()
+        try:
+            result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        except Exception as e:
+            # Only this batch is lost; later batches still render
+            logging.error(f"{Color.ERROR}Error running ffmpeg on {video_file}: {e}{Color.RESET}")
+            continue
+        elapsed = max(time.monotonic() - started, 1e-6)
+
+        if result.returncode != 0:
+            logging.error(f"{Color.ERROR}Error rendering shorts from {video_file}: {result.stderr.strip()}{Color.RESET}")
+            continue
+
+        for start_time, end_time, output_file in batch:
+            size_mb = os.path.getsize(output_file) / (1024 * 1024) if os.path.exists(output_file) else 0.0
+            logging.info(
+                f"{Color.INFO}Created short clip: {output_file} from {start_time:.2f} to {end_time:.2f} "
+                f"({size_mb:.1f} MB){Color.RESET}")
+            created.append(output_file)
+        # The outputs share one decode, so throughput is only meaningful for the batch as a whole
+        rendered = sum(end_time - start_time for start_time, end_time, _ in batch)
+        logging.info(
+            f"{Color.INFO}Rendered {count} shorts ({rendered:.0f}s of video) in one pass in {elapsed:.1f}s, "
+            f"{rendered / elapsed:.2f}x realtime{Color.RESET}")
+
+    return created
+
+
+def validate_render(output_file, expected_duration, tolerance=0.15, decode=True):
+    """Check that the output's video and audio streams both last about expected_duration.
+
+    With decode=True the whole file is also decoded, which catches a spliced
+    section that does not match the parameter sets in use.
+    """
+    try:
+        data = ffprobe_json(output_file, ["-show_entries", "stream=codec_type,duration"])
+    except Exception as e:
+        logging.warning(f"{Color.WARNING}Could not validate {output_file}: {e}{Color.RESET}")
+        return False
+
+    durations = {}
+    for stream in data.get("streams", []):
+        if stream.get("duration") not in (None, "N/A"):
+            durations[stream["codec_type"]] = float(stream["duration"])
+    if "video" not in durations:
+        return False
+    if abs(durations["video"] - expected_duration) > tolerance:
+        return False
+    if "audio" in durations and abs(durations["audio"] - durations["video"]) > tolerance:
+        return False
+    if decode:
+        result = subprocess.run(["ffmpeg", "-hide_banner", "-v", "error", "-i", output_file, "-f", "null", "-"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0 or result.stderr.strip():
+            return False
+    return True
+
+
+def _smart_encode_args(meta):
+    """Encoder arguments that match the source's codec, profile and level, or None if unsupported."""
+    if meta["video_codec"] not in SMART_ENCODERS:
+        return None
+    encoder, extension, extra = SMART_ENCODERS[meta["video_codec"]]
+    args = ["-an", "-c:v", encoder, "-pix_fmt", meta["pix_fmt"] or "yuv420p"] + extra
+    profile = (meta.get("profile") or "").lower()
+    level = meta.get("level")
+    if meta["video_codec"] == "h264":
+        if profile in H264_PROFILES:
+            args += ["-profile:v", H264_PROFILES[profile]]
+        if level and level > 9:
+            args += ["-level", f"{level / 10:.1f}"]
+    elif meta["video_codec"] == "hevc":
+        if profile in HEVC_PROFILES:
+            args += ["-profile:v", HEVC_PROFILES[profile]]
+        if level and level > 0:
+            args[args.index("repeat-headers=1")] = f"repeat-headers=1:level-idc={level / 30:.1f}"
+    return args, extension
+
+
+def smart_render_short(video_file, start_time, end_time, output_file, keyframes, fade=1, has_audio=True):
+    """Render a short by re-encoding only the fade GOPs and stream-copying the middle.
+
+    The head (start to the first keyframe after the fade-in) and the tail
+    (last keyframe before the fade-out to the end) are re-encoded with the
+    source's video codec; the keyframe-aligned middle is copied as-is. Audio
+    is cheap and is re-encoded in one piece so it stays in sync. Returns
+    False when no copyable middle exists or the result fails validation.
+    """
+    meta = probe(video_file)
+    encode = _smart_encode_args(meta)
+    copy_start = next((k for k in keyframes if k >= start_time + fade), None)
+    copy_end = next((k for k in reversed(keyframes) if k <= end_time - fade), None)
+    if encode is None or copy_start is None or copy_end is None or copy_end <= copy_start:
+        return False
+    encode, extension = encode
+
+    duration = end_time - start_time
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        head = os.path.join(tmp_dir, f"head{extension}")
+        middle = os.path.join(tmp_dir, f"middle{extension}")
+        tail = os.path.join(tmp_dir, f"tail{extension}")
+        video = os.path.join(tmp_dir, f"video{extension}")
+        concat_list = os.path.join(tmp_dir, "concat.txt")
+        tail_duration = end_time - copy_end
+
+        # Keyframe pts are microsecond-exact; seeking the copy a hair past the keyframe
+        # guarantees rounding never lands before it and pulls in the previous GOP
+        steps = [
+            ["-ss", f"{start_time:.6f}", "-i", video_file, "-t", f"{copy_start - start_time:.6f}",
+             "-vf", f"fade=t=in:st=0:d={fade}"] + encode + [head],
+            ["-ss", f"{copy_start + 0.0005:.6f}", "-i", video_file, "-t", f"{copy_end - copy_start:.6f}",
+             "-an", "-c:v", "copy", "-avoid_negative_ts", "make_zero", middle],
+            ["-ss", f"{copy_end:.6f}", "-i", video_file, "-t", f"{tail_duration:.6f}",
+             "-vf", f"fade=t=out:st={max(0.0, tail_duration - fade):.6f}:d={fade}"] + encode + [tail],
+            ["-f", "concat", "-safe", "0", "-i", concat_list, "-c", "copy", video],
+        ]
+        with open(concat_list, "w") as f:
+            f.write("".join(f"file '{piece}'\n" for piece in (head, middle, tail)))
+
+        mux = ["-i", video]
+        if has_audio:
+            mux += ["-ss", f"{start_time:.3f}", "-i", video_file, "-t", f"{duration:.3f}",
+                    "-map", "0:v:0", "-map", "1:a:0", "-c:a", "aac"]
+        steps.append(mux + ["-c:v", "copy", "-movflags", "+faststart", output_file])
+
+        for step in steps:
+            result = subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"] + step,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            if result.returncode != 0:
+                logging.warning(f"{Color.WARNING}Smart render step failed for {output_file}: {result.stderr.strip()}{Color.RESET}")
+                return False
+
+    if not validate_render(output_file, duration):
+        logging.warning(f"{Color.WARNING}Smart render of {output_file} failed A/V validation.{Color.RESET}")
+        return False
+
+    logging.info(
+        f"{Color.INFO}Created short clip: {output_file} from {start_time:.2f} to {end_time:.2f} "
+        f"(re-encoded {copy_start - start_time + tail_duration:.1f}s of {duration:.1f}s){Color.RESET}")
+    return True
+
+
+def _render_shorts(video_file, jobs, renderer='moviepy', has_audio=True):
+    """Render (start, end, output_file) jobs from video_file and return the files created."""
+    if renderer == 'ffmpeg':
+        return render_shorts_ffmpeg(video_file, jobs, has_audio=has_audio)
+
+    if renderer == 'smart':
+        created = []
+        keyframes = keyframe_times(video_file)
+        fallback = []
+        for start_time, end_time, output_file in jobs:
+            if smart_render_short(video_file, start_time, end_time, output_file, keyframes, has_audio=has_audio):
+                created.append(output_file)
+            else:
+                fallback.append((start_time, end_time, output_file))
+        # Anything that could not be smart-rendered gets a full re-encode
+        return created + render_shorts_ffmpeg(video_file, fallback, has_audio=has_audio)
+
+    created = []
+    if not jobs:
+        return created
+    with VideoFileClip(video_file) as clip:
+        for start_time, end_time, output_file in jobs:
+            short_clip = clip.subclip(start_time, end_time)
+            short_clip = short_clip.fx(vfx.fadein, 1).fx(vfx.fadeout, 1)
+            short_clip.write_videofile(output_file, codec='libx264', audio_codec='aac')
+            logging.info(
+                f"{Color.INFO}Created short clip: {output_file} from {start_time:.2f} to {end_time:.2f}{Color.RESET}")
+            created.append(output_file)
+    return created
+
+
+def create_shorts_from_segments(min_duration=25, max_duration=60, min_clips=4, max_clips=10, detector='fast',
+                                scene_workers=None, use_cache=True, seed=None, rank_audio=False,
+                                renderer='moviepy', use_proxy=False, refine_cuts=False, video_files=None):
+    """Create YouTube Shorts from video_files, or from every video in the current directory."""
     shorts_created = []
-    video_files = [f for f in os.listdir('.') if f.endswith(('.mp4', '.webm'))]
+    rng = random.Random(seed)
+    if video_files is None:
+        # Hidden files are analysis proxies, not sources
+        video_files = [f for f in os.listdir('.') if f.endswith(('.mp4', '.webm')) and not f.startswith('.')]
 
     for video_file in video_files:
         logging.info(f"{Color.INFO}Processing video for shorts: {video_file}{Color.RESET}")
         try:
-            with VideoFileClip(video_file) as clip:
-                total_duration = clip.duration
-                if total_duration < min_duration:
-                    logging.warning(
-                        f"{Color.WARNING}Video {video_file} is shorter than the minimum duration for shorts. Skipping.{Color.RESET}")
-                    continue
+            meta = probe(video_file)
+            total_duration = meta['duration']
+            if total_duration < min_duration:
+                logging.warning(
+                    f"{Color.WARNING}Video {video_file} is shorter than the minimum duration for shorts. Skipping.{Color.RESET}")
+                continue
 
-                # Detect scenes and create shorts
-                scenes = detect_scenes(video_file)
-                if len(scenes) < 2:
-                    logging.warning(
-                        f"{Color.WARNING}Not enough scenes detected to create shorts from {video_file}. Skipping.{Color.RESET}")
+            # The proxy costs a full decode, so it is only built when the scene detector or the audio
+            # ranking will read it; compressed and classic detection work on the source
+            proxy = None
+            if use_proxy and (detector in ('fast', 'chunked') or rank_audio):
+                proxy = build_analysis_proxy(video_file)
+            debug_video_properties(video_file, proxy=proxy)
+
+            # Detect scenes and create shorts
+            params = {"refine": True} if detector == 'compressed' and refine_cuts else None
+            scenes = detect_scene_times(video_file, detector, fps=meta['fps'], workers=scene_workers,
+                                        params=params, use_cache=use_cache, proxy=proxy)
+            if len(scenes) < 2:
+                logging.warning(
+                    f"{Color.WARNING}Not enough scenes detected to create shorts from {video_file}. Skipping.{Color.RESET}")
+                continue
+
+            existing_shorts = set(f for f in os.listdir('.') if f.startswith("short_"))
+            shorts_to_create = rng.randint(min_clips, max_clips)  # Create between min_clips and max_clips
+
+            # Non-overlapping clips from different sections of the video
+            candidates = candidate_intervals(scenes, min_duration, max_duration)
+            samples = decode_audio_pcm(video_file, proxy=proxy) if rank_audio and candidates else None
+            if samples is not None:
+                # Only the highest-scoring candidates get rendered
+                scores = score_intervals(candidates, audio_features(samples))
+                selected = select_top_intervals(candidates, scores, shorts_to_create)
+                logging.info(
+                    f"{Color.INFO}Ranked {len(candidates)} candidates by audio, best score {scores.max():.2f}{Color.RESET}")
+            else:
+                selected = select_intervals(candidates, shorts_to_create, seed=seed)
+            if len(selected) < shorts_to_create:
+                logging.warning(
+                    f"{Color.WARNING}Only {len(selected)} of {shorts_to_create} shorts fit between scene cuts in {video_file}.{Color.RESET}")
+
+            video_title = os.path.splitext(os.path.basename(video_file))[0]
+            jobs = []
+            for index, (start_time, end_time) in enumerate(selected, start=1):
+                output_file = f"short_{video_title}_{index}.mp4"
+
+                # Ensure the short does not already exist
+                if output_file in existing_shorts:
+                    logging.warning(f"{Color.WARNING}Short already exists: {output_file}. Skipping.{Color.RESET}")
                     continue
+                jobs.append((start_time, end_time, os.path.join(RENDER_DIR, output_file)))
 
-                existing_shorts = set(os.path.splitext(f)[0] for f in os.listdir('.') if f.startswith("short_"))
-                shorts_to_create = random.randint(min_clips, max_clips)  # Create between min_clips and max_clips
-                created_this_video = 0
-
-                # Ensure we create shorts from different sections of the video
-                used_time_ranges = []
-
-                while created_this_video < shorts_to_create:
-                    start_scene = random.choice(scenes[:-1])  # Ensure we don't go out of bounds
-                    end_scene = random.choice(scenes[1:])  # Ensure end_scene is after start_scene
-                    if end_scene <= start_scene:
-                        continue
-
-                    start_time = start_scene / clip.fps
-                    end_time = end_scene / clip.fps
-                    clip_duration = end_time - start_time
-
-                    if min_duration <= clip_duration <= max_duration:
-                        time_range = (start_time, end_time)
-
-                        # Check if this time range has been used before
-                        if time_range not in used_time_ranges:
-                            output_file = f"short_{os.path.splitext(os.path.basename(video_file))[0]}_{created_this_video + 1}.mp4"
-
-                            # Ensure the short does not already exist
-                            if output_file not in existing_shorts:
-                                short_clip = clip.subclip(start_time, end_time)
-                                short_clip = short_clip.fx(vfx.fadein, 1).fx(vfx.fadeout, 1)
-                                short_clip.write_videofile(output_file, codec='libx264', audio_codec='aac')
-                                logging.info(
-                                    f"{Color.INFO}Created short clip: {output_file} from {start_time:.2f} to {end_time:.2f}{Color.RESET}")
-                                shorts_created.append(output_file)
-                                created_this_video += 1
-                                used_time_ranges.append(time_range)  # Mark this time range as used
-                            else:
-                                logging.warning(
-                                    f"{Color.WARNING}Short already exists: {output_file}. Skipping.{Color.RESET}")
-                        else:
-                            logging.warning(
-                                f"{Color.WARNING}Time range {time_range} has already been used. Skipping this clip.{Color.RESET}")
-                    else:
-                        logging.warning(
-                            f"{Color.WARNING}Generated clip duration is not within the specified range: {clip_duration:.2f} seconds. Skipping.{Color.RESET}")
+            # Render under a hidden folder so nothing scanning for .mp4 files sees a half-written short
+            os.makedirs(RENDER_DIR, exist_ok=True)
+            created = _render_shorts(video_file, jobs, renderer, has_audio=meta['audio'] is not None)
+            for start_time, end_time, render_file in jobs:
+                if render_file in created:
+                    output_file = os.path.basename(render_file)
+                    os.replace(render_file, output_file)
+                    record_manifest(output_file, video_file, start_time, end_time)
+                    shorts_created.append(output_file)
         except Exception as e:
             logging.error(f"{Color.ERROR}Error processing video {video_file}: {e}{Color.RESET}")
 
     return shorts_created
 
 
-def main(video_urls=None, create_shorts=False, min_clips=4, max_clips=10):
+def main(video_urls=None, create_shorts=False, min_clips=4, max_clips=10, copy=False, exact=False,
+         workers=1, threads=None, detector='fast', scene_workers=None,
+         use_cache=True, seed=None, rank_audio=False, renderer='moviepy', use_proxy=False,
+         refine_cuts=False, video_files=None, downloads=1, fragments=1, min_free_gb=2):
     if create_shorts:
-        create_shorts_from_segments(min_clips=min_clips, max_clips=max_clips)
+        create_shorts_from_segments(min_clips=min_clips, max_clips=max_clips, detector=detector,
+                                    scene_workers=scene_workers, use_cache=use_cache, seed=seed,
+                                    rank_audio=rank_audio, renderer=renderer, use_proxy=use_proxy,
+                                    refine_cuts=refine_cuts, video_files=video_files)
+    elif video_urls and downloads > 1:
+        download_and_split(video_urls, downloads=downloads, fragments=fragments, min_free_gb=min_free_gb,
+                           copy=copy, exact=exact, workers=workers, threads=threads)
     elif video_urls:
         for url in video_urls:
-            video_file = download_video(url)
+            video_file = download_video(url, fragments=fragments)
             if video_file:
                 debug_video_properties(video_file)
-                split_video(video_file)
+                split_video(video_file, copy=copy, exact=exact, workers=workers, threads=threads)
 
 
 def read_links_from_file(file_path):
@@ -230,11 +1242,53 @@ if __name__ == "__main__":
                         help="Create shorts from videos in the current directory.")
     parser.add_argument('--min_clips', type=int, default=4, help="Minimum number of shorts to create.")
     parser.add_argument('--max_clips', type=int, default=10, help="Maximum number of shorts to create.")
+    parser.add_argument('--copy', action='store_true',
+                        help="Split downloads on keyframes without re-encoding.")
+    parser.add_argument('--exact', action='store_true',
+                        help="Re-encode to hit exact split boundaries, even with --copy.")
+    parser.add_argument('--workers', type=int, default=1, help="Number of segments to re-encode in parallel.")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="Encoder threads per worker (defaults to CPU count divided by workers).")
+    parser.add_argument('--downloads', type=int, default=1,
+                        help="Videos to download at once; each is split as soon as it finishes.")
+    parser.add_argument('--fragments', type=int, default=1,
+                        help="Fragments fetched concurrently within each download.")
+    parser.add_argument('--min_free_gb', type=float, default=2,
+                        help="Pause downloads while free disk space is below this many GB.")
+    parser.add_argument('--scene_detector', choices=['fast', 'chunked', 'compressed', 'classic'], default='fast',
+                        help="Scene detector used for shorts: downscaled adaptive ('fast'), the same split "
+                             "across processes ('chunked'), bitstream-only without decoding ('compressed') "
+                             "or full-frame ('classic').")
+    parser.add_argument('--refine_cuts', action='store_true',
+                        help="With the compressed detector, confirm each cut by decoding a short window around it.")
+    parser.add_argument('--scene_workers', type=int, default=None,
+                        help="Worker processes for the chunked scene detector (defaults to CPU count).")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for reproducible short selection.")
+    parser.add_argument('--rank_audio', action='store_true',
+                        help="Render the candidates with the most speech and loudness instead of spreading them out.")
+    parser.add_argument('--renderer', choices=['moviepy', 'ffmpeg', 'smart'], default='moviepy',
+                        help="Render shorts one by one with moviepy, all at once from a single ffmpeg decode, "
+                             "or by re-encoding only the fade GOPs and copying the rest ('smart').")
+    parser.add_argument('--proxy', action='store_true',
+                        help="Run scene and audio analysis on a cached low-resolution proxy of each video "
+                             "(used by the fast and chunked detectors and by --rank_audio).")
+    parser.add_argument('--no_scene_cache', action='store_true', help="Always re-run scene detection.")
+    parser.add_argument('--clear_scene_cache', action='store_true', help="Drop all cached scene indices first.")
+    parser.add_argument('--video_files', nargs='+', default=None,
+                        help="With --create_shorts, use these videos instead of scanning the current directory.")
 
     args = parser.parse_args()
 
+    if args.clear_scene_cache:
+        cache_clear(SCENE_CACHE)
     if args.url_file:
         video_urls = read_links_from_file(args.url_file)
-        main(video_urls=video_urls)
+        main(video_urls=video_urls, copy=args.copy, exact=args.exact,
+             workers=args.workers, threads=args.threads, downloads=args.downloads,
+             fragments=args.fragments, min_free_gb=args.min_free_gb)
     if args.create_shorts:
-        main(create_shorts=True, min_clips=args.min_clips, max_clips=args.max_clips)
\ No newline at end of file
+        main(create_shorts=True, min_clips=args.min_clips, max_clips=args.max_clips,
+             detector=args.scene_detector, scene_workers=args.scene_workers,
+             use_cache=not args.no_scene_cache, seed=args.seed, rank_audio=args.rank_audio,
+             renderer=args.renderer, use_proxy=args.proxy,
+             refine_cuts=args.refine_cuts, video_files=args.video_files)
\ No newline at end of file
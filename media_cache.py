@@ -0,0 +1,92 @@
+import os
+import json
+import hashlib
+import logging
+
+# Shared on-disk cache for analysis results (scene indices, probes, transcripts)
+CACHE_DIR = os.environ.get("TERMUXTUBE_CACHE", os.path.expanduser("~/.cache/termuxtube"))
+
+
+def file_fingerprint(path, block_size=65536, blocks=4):
+    """Cheap content fingerprint: size, mtime and a hash of a few evenly spaced blocks."""
+    stat = os.stat(path)
+    digest = hashlib.sha1(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(path, "rb") as f:
+        if stat.st_size <= block_size * blocks:
+            digest.update(f.read())
+        else:
+            for i in range(blocks):
+                f.seek((stat.st_size - block_size) * i // (blocks - 1))
+                digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+
+def cache_key(fingerprint, **params):
+    """Combine a file fingerprint with the parameters that produced a result."""
+    payload = json.dumps({"file": fingerprint, "params": params}, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _entry_path(namespace, key):
+    return os.path.join(CACHE_DIR, namespace, f"{key}.json")
+
+
+def cache_load(namespace, key):
+    """Return a cached value, or None if it is missing or unreadable."""
+    path = _entry_path(namespace, key)
+    try:
+        with open(path, "r") as f:
+            value = json.load(f)
+        os.utime(path)  # Mark as recently used for eviction
+        return value
+    except (OSError, ValueError):
+        return None
+
+
+def cache_store(namespace, key, value, max_bytes=50 * 1024 * 1024):
+    """Write a value atomically, then evict least recently used entries above max_bytes."""
+    path = _entry_path(namespace, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logging.warning(f"Could not write cache entry {path}: {e}")
+        return
+    _evict(namespace, max_bytes)
+
+
+def cache_clear(namespace, key=None):
+    """Invalidate one entry, or the whole namespace when no key is given."""
+    folder = os.path.join(CACHE_DIR, namespace)
+    names = [f"{key}.json"] if key else (os.listdir(folder) if os.path.isdir(folder) else [])
+    for name in names:
+        try:
+            os.remove(os.path.join(folder, name))
+        except OSError:
+            pass
+
+
+def _evict(namespace, max_bytes):
+    folder = os.path.join(CACHE_DIR, namespace)
+    entries = []
+    for name in os.listdir(folder):
+        if not name.endswith(".json"):
+            continue
+        try:
+            stat = os.stat(os.path.join(folder, name))
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(folder, name))
+            total -= size
+        except OSError:
+            pass
@@ -0,0 +1,75 @@
+import json
+import subprocess
+from fractions import Fraction
+from media_cache import file_fingerprint, cache_key, cache_load, cache_store
+
+PROBE_CACHE = "probes"
+PROBE_VERSION = 2  # Bump when the probe result format changes
+
+
+def ffprobe_json(video_file, args):
+    """Run ffprobe with JSON output and return the parsed result."""
+    result = subprocess.run(["ffprobe", "-v", "error", "-of", "json"] + args + [video_file],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffprobe failed on {video_file}")
+    return json.loads(result.stdout)
+
+
+def _frame_rate(stream):
+    for field in ("avg_frame_rate", "r_frame_rate"):
+        rate = stream.get(field, "0/0")
+        if rate not in ("0/0", "N/A"):
+            return float(Fraction(rate))
+    return None
+
+
+def probe(video_file, keyframes=False, use_cache=True):
+    """Return a file's duration, fps, size, codecs and audio format, cached per content fingerprint.
+
+    With keyframes=True the result also holds "keyframes", the video
+    keyframe timestamps read from packet flags (a full demux on first use).
+    """
+    fingerprint = file_fingerprint(video_file)
+    key = cache_key(fingerprint, probe=PROBE_VERSION)
+    meta = cache_load(PROBE_CACHE, key) if use_cache else None
+    if meta is None:
+        info = ffprobe_json(video_file, [
+            "-show_entries",
+            "format=duration:stream=codec_type,codec_name,profile,level,width,height,avg_frame_rate,r_frame_rate,"
+            "pix_fmt,sample_rate,channels,duration"])
+        streams = info.get("streams", [])
+        video = next((s for s in streams if s.get("codec_type") == "video"), {})
+        audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+        duration = info.get("format", {}).get("duration", video.get("duration"))
+        meta = {
+            "duration": float(duration) if duration not in (None, "N/A") else None,
+            "fps": _frame_rate(video),
+            "size": [video.get("width"), video.get("height")],
+            "video_codec": video.get("codec_name"),
+            "profile": video.get("profile"),
+            "level": video.get("level"),
+            "pix_fmt": video.get("pix_fmt"),
+            "audio": {
+                "codec": audio.get("codec_name"),
+                "sample_rate": int(audio.get("sample_rate", 0)),
+                "channels": audio.get("channels"),
+            } if audio else None,
+        }
+        cache_store(PROBE_CACHE, key, meta)
+
+    if keyframes:
+        meta = dict(meta, keyframes=keyframe_times(video_file, use_cache, fingerprint))
+    return meta
+
+
+def keyframe_times(video_file, use_cache=True, fingerprint=None):
+    """Return video keyframe timestamps read from the packet flags, without decoding."""
+    key = cache_key(fingerprint or file_fingerprint(video_file), probe=PROBE_VERSION, keyframes=True)
+    times = cache_load(PROBE_CACHE, key) if use_cache else None
+    if times is None:
+        data = ffprobe_json(video_file, ["-select_streams", "v:0", "-show_entries", "packet=pts_time,flags"])
+        times = [float(packet["pts_time"]) for packet in data.get("packets", [])
+                 if "K" in packet.get("flags", "") and packet.get("pts_time") not in (None, "N/A")]
+        cache_store(PROBE_CACHE, key, times)
+    return times
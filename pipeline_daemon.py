@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import shlex
+import shutil
+import struct
+import select
+import ctypes
+import logging
+import argparse
+import importlib
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from long_to_clips import Color, download_video, read_links_from_file
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+VIDEO_EXTENSIONS = ('.mp4', '.webm', '.mkv')
+POLL_INTERVAL = 5
+
+# Each stage feeds every output of a job to the stages listed here
+PIPELINE = {
+    "download": ["split"],
+    "split": ["shorts"],
+    "shorts": ["titles"],
+    "titles": ["upload"],
+    "upload": [],
+}
+
+IN_CLOSE_WRITE = 0x08
+IN_MOVED_TO = 0x80
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+
+class InotifyWatcher:
+    """Report files that were finished writing in, or moved into, a folder."""
+
+    def __init__(self, folder):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(folder), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"Cannot watch {folder}")
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self.fd, 65536)
+        names = []
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            names.append(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback watcher: report files whose size did not change since the previous poll."""
+
+    def __init__(self, folder, interval=POLL_INTERVAL):
+        self.folder = folder
+        self.interval = interval
+        self.sizes = {}
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        sizes = {}
+        for name in os.listdir(self.folder):
+            try:
+                sizes[name] = os.path.getsize(os.path.join(self.folder, name))
+            except OSError:
+                continue
+        ready = [name for name, size in sizes.items() if self.sizes.get(name) == size]
+        self.sizes = sizes
+        return ready
+
+    def close(self):
+        pass
+
+
+def open_watcher(folder, polling=False):
+    if not polling:
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError) as e:
+            logging.warning(f"{Color.WARNING}inotify unavailable ({e}), polling every {POLL_INTERVAL}s{Color.RESET}")
+    return PollingWatcher(folder)
+
+
+class Pipeline:
+    """Run stage jobs on per-stage thread pools and route each job's outputs downstream.
+
+    A job that is already queued absorbs duplicate submissions, and one that
+    is running is run once more afterwards, so folder-level stages such as
+    titles pick up files that arrived while they were busy.
+    """
+
+    def __init__(self, stages, limits, edges=PIPELINE):
+        self.stages = stages
+        self.edges = edges
+        self.pools = {name: ThreadPoolExecutor(max_workers=max(1, limits.get(name, 1)), thread_name_prefix=name)
+                      for name in stages}
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.running = set()
+        self.rerun = set()
+        self.active = 0
+
+    def submit(self, stage, item):
+        if stage not in self.stages:
+            return  # Stage disabled
+        key = (stage, item)
+        with self.lock:
+            if key in self.pending:
+                return
+            if key in self.running:
+                self.rerun.add(key)
+                return
+            self.pending.add(key)
+            self.active += 1
+        try:
+            self.pools[stage].submit(self._run, stage, item)
+        except RuntimeError:
+            with self.lock:
+                self.pending.discard(key)
+                self.active -= 1
+            raise
+
+    def _run(self, stage, item):
+        key = (stage, item)
+        with self.lock:
+            self.pending.discard(key)
+            self.running.add(key)
+        try:
+            outputs = self.stages[stage](item) or []
+        except Exception as e:
+            logging.error(f"{Color.ERROR}Stage {stage} failed for {item}: {e}{Color.RESET}")
+            outputs = []
+
+        with self.lock:
+            self.running.discard(key)
+            again = key in self.rerun
+            self.rerun.discard(key)
+        try:
+            for output in outputs:
+                for next_stage in self.edges.get(stage, []):
+                    self.submit(next_stage, output)
+            if again:
+                self.submit(stage, item)
+        except RuntimeError as e:
+            # The pools refuse new work once shutdown() has started
+            logging.warning(f"{Color.WARNING}Dropped follow-ups of {stage} for {item}: {e}{Color.RESET}")
+        finally:
+            # Only count the job as finished once its follow-ups are queued
+            with self.lock:
+                self.active -= 1
+
+    def idle(self):
+        with self.lock:
+            return self.active == 0
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown(wait=True)
+
+
+def _run_script(script, args, cwd):
+    command = [sys.executable, os.path.join(SCRIPT_DIR, script)] + args
+    result = subprocess.run(command, cwd=cwd)
+    if result.returncode != 0:
+        raise RuntimeError(f"{script} exited with code {result.returncode}")
+
+
+def make_stages(root, args):
+    """Build the stage functions; each takes one item and returns the items for the next stages."""
+    downloads_dir = os.path.join(root, "downloads")
+    work_dir = os.path.join(root, "work")
+    shorts_root = os.path.join(root, "Shorts")
+    description_template = os.path.join(root, "description.txt")
+
+    def claim_video(video_file):
+        # Every source gets its own folder for its segments and manifest
+        stem = os.path.splitext(os.path.basename(video_file))[0]
+        folder = os.path.join(work_dir, stem)
+        os.makedirs(folder, exist_ok=True)
+        target = os.path.join(folder, os.path.basename(video_file))
+        shutil.move(video_file, target)
+        return target
+
+    def download(url):
+        video_file = download_video(url, downloads_dir)
+        if not video_file or not os.path.exists(video_file):
+            raise RuntimeError("download failed")
+        return [claim_video(video_file)]
+
+    def split(video_file):
+        folder = os.path.dirname(video_file)
+        stem = os.path.splitext(os.path.basename(video_file))[0]
+        _run_script("splitter.py", ["--video_file", os.path.basename(video_file)] + shlex.split(args.split_args), folder)
+        prefix = f"{stem}_part_"
+        parts = [f for f in os.listdir(folder) if f.startswith(prefix) and f.endswith(".mp4")]
+        parts.sort(key=lambda f: int(f[len(prefix):-4]) if f[len(prefix):-4].isdigit() else 0)
+        return [os.path.join(folder, f) for f in parts]
+
+    def shorts(segment):
+        folder = os.path.join(shorts_root, os.path.basename(os.path.dirname(segment)))
+        os.makedirs(folder, exist_ok=True)
+        description = os.path.join(folder, "description.txt")
+        if os.path.exists(description_template) and not os.path.exists(description):
+            shutil.copy(description_template, description)
+        _run_script("long_to_clips.py", ["--create_shorts", "--video_files", segment] + shlex.split(args.shorts_args),
+                    folder)
+        return [folder]
+
+    titles_module = importlib.import_module("generate_titles_clean" if args.clean_titles else "generate_titles")
+
+    def titles(folder):
+        titles_module.generate_titles(folder, incremental=True)
+        return [folder]
+
+    stages = {"download": download, "split": split, "shorts": shorts, "titles": titles}
+
+    if args.upload:
+        uploader = importlib.import_module("youtube_upload_shorts")
+        from upload_scheduler import TokenBucket
+        bucket = TokenBucket(args.publish_interval)
+
+        def upload(folder):
+            uploader.main(folder, publish_interval=args.publish_interval, bucket=bucket)
+            return []
+
+        stages["upload"] = upload
+
+    for folder in (downloads_dir, work_dir, shorts_root):
+        os.makedirs(folder, exist_ok=True)
+    return stages, claim_video
+
+
+def run(root, args):
+    inbox = os.path.join(root, "inbox")
+    url_archive = os.path.join(root, "work", "urls")
+    os.makedirs(inbox, exist_ok=True)
+    os.makedirs(url_archive, exist_ok=True)
+
+    stages, claim_video = make_stages(root, args)
+    limits = {"download": args.downloads, "split": args.splits, "shorts": args.shorts,
+              "titles": args.titles, "upload": args.uploads}
+    pipeline = Pipeline(stages, limits)
+
+    def intake(name):
+        path = os.path.join(inbox, name)
+        if name.startswith('.') or not os.path.isfile(path):
+            return
+        if name.endswith('.txt'):
+            # Move the list out of the inbox so a restart does not download it again
+            archived = os.path.join(url_archive, f"{int(time.time())}_{name}")
+            shutil.move(path, archived)
+            for url in read_links_from_file(archived):
+                pipeline.submit("download", url)
+        elif name.lower().endswith(VIDEO_EXTENSIONS):
+            logging.info(f"{Color.INFO}Queued video: {name}{Color.RESET}")
+            pipeline.submit("split", claim_video(path))
+
+    watcher = open_watcher(inbox, polling=args.poll)
+    logging.info(f"{Color.INFO}Watching {inbox}{Color.RESET}")
+    try:
+        # Files dropped in while the daemon was down never produce an event
+        for name in sorted(os.listdir(inbox)):
+            intake(name)
+        while True:
+            for name in watcher.wait(POLL_INTERVAL):
+                intake(name)
+            if args.once and pipeline.idle():
+                break
+    except KeyboardInterrupt:
+        logging.info(f"{Color.INFO}Stopping after running jobs finish...{Color.RESET}")
+    finally:
+        watcher.close()
+        pipeline.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Watch ROOT/inbox for URL lists (.txt) and videos, and run every file through "
+                    "download, split, shorts, titles and upload as independent jobs.")
+    parser.add_argument('root', help="Pipeline folder; inbox/, work/ and Shorts/ are created inside it.")
+    parser.add_argument('--poll', action='store_true', help="Poll the inbox instead of using inotify.")
+    parser.add_argument('--once', action='store_true', help="Exit once the inbox and all queued jobs are done.")
+    parser.add_argument('--downloads', type=int, default=2, help="Concurrent downloads.")
+    parser.add_argument('--splits', type=int, default=1, help="Concurrent split jobs.")
+    parser.add_argument('--shorts', type=int, default=1, help="Concurrent shorts jobs.")
+    parser.add_argument('--titles', type=int, default=1, help="Folders titled at the same time.")
+    parser.add_argument('--uploads', type=int, default=1, help="Folders uploaded at the same time.")
+    parser.add_argument('--split_args', default="", help="Extra arguments for splitter.py, e.g. \"--copy\".")
+    parser.add_argument('--shorts_args', default="",
+                        help="Extra arguments for long_to_clips.py --create_shorts, e.g. \"--renderer smart\".")
+    parser.add_argument('--clean_titles', action='store_true', help="Title with generate_titles_clean.py.")
+    parser.add_argument('--upload', action='store_true', help="Upload titled shorts with youtube_upload_shorts.py.")
+    parser.add_argument('--publish_interval', type=float, default=300, help="Seconds between published shorts.")
+    args = parser.parse_args()
+
+    run(os.path.abspath(args.root), args)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+import re
+import time
+import random
+import string
+import argparse
+
+# Characters commonly swapped in for letters to dodge filters
+LEET = {
+    "a": "a4@", "b": "b8", "e": "e3", "g": "g9", "i": "i1!|", "l": "l1|",
+    "o": "o0", "s": "s5$", "t": "t7+", "z": "z2",
+}
+
+
+class ProfanityFilter:
+    """A word list compiled once into a single prefix-factored regex.
+
+    Shared prefixes are merged (a trie turned into nested alternations), so
+    matching cost grows with text length rather than with list size. With
+    obfuscated=True every letter also matches its leet-speak substitutes
+    and repeats, e.g. "sh1iit" or "b!tchhh".
+    """
+
+    def __init__(self, words, obfuscated=True):
+        self.obfuscated = obfuscated
+        trie = {}
+        for word in words:
+            word = word.strip().lower()
+            if not word:
+                continue
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[""] = {}
+        body = self._pattern(trie)
+        self.regex = re.compile(rf"(?<!\w)(?:{body})(?!\w)", re.IGNORECASE) if trie else None
+
+    @classmethod
+    def from_file(cls, path, obfuscated=True):
+        """Load one term per line; blank lines and lines starting with # are ignored."""
+        with open(path, "r", encoding="utf-8") as f:
+            words = [line for line in f if line.strip() and not line.lstrip().startswith("#")]
+        return cls(words, obfuscated)
+
+    def _char(self, char):
+        if char == " ":
+            return r"\s+"
+        if not self.obfuscated:
+            return re.escape(char)
+        variants = LEET.get(char, char)
+        return "[" + "".join(re.escape(v) for v in variants) + "]+"
+
+    def _pattern(self, node):
+        branches = [self._char(char) + self._pattern(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        group = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # A word ends here, so everything after it is optional
+            return f"(?:{group})?"
+        return group
+
+    def contains(self, text):
+        return bool(self.regex and self.regex.search(text))
+
+    def clean(self, text):
+        """Remove listed words, then tidy up the spaces and punctuation left behind."""
+        if self.regex:
+            text = self.regex.sub("", text)
+        return _tidy(text)
+
+    def clean_batch(self, texts):
+        """Clean many texts with a single regex pass over all of them."""
+        texts = list(texts)
+        if not self.regex or any("\0" in text for text in texts):
+            return [self.clean(text) for text in texts]
+        joined = self.regex.sub("", "\0".join(texts))
+        return [_tidy(text) for text in joined.split("\0")]
+
+
+def _tidy(text):
+    text = re.sub(r"\s{2,}", " ", text).strip()
+    return re.sub(r"^[^\w]+|[^\w]+$", "", text)
+
+
+def _naive_clean(text, words):
+    # The original approach: one re.sub per listed word
+    for word in words:
+        text = re.sub(rf"\b{re.escape(word)}\b", "", text, flags=re.IGNORECASE)
+    return _tidy(text)
+
+
+def benchmark(sizes=(10, 100, 1000, 5000), texts=200, seed=0):
+    """Time the per-word loop against the compiled filter for growing word lists."""
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(max(sizes))]
+    samples = [" ".join(rng.choice(vocabulary) if rng.random() < 0.05 else "word" for _ in range(20))
+               for _ in range(texts)]
+
+    print(f"{'terms':>6} {'per-word loop':>14} {'compiled':>10} {'batch':>10}")
+    for size in sizes:
+        words = vocabulary[:size]
+        started = time.perf_counter()
+        for text in samples:
+            _naive_clean(text, words)
+        naive = time.perf_counter() - started
+
+        profanity_filter = ProfanityFilter(words)
+        started = time.perf_counter()
+        for text in samples:
+            profanity_filter.clean(text)
+        compiled = time.perf_counter() - started
+
+        started = time.perf_counter()
+        profanity_filter.clean_batch(samples)
+        batch = time.perf_counter() - started
+        print(f"{size:>6} {naive * 1000:>12.1f}ms {compiled * 1000:>8.1f}ms {batch * 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the compiled profanity filter.")
+    parser.add_argument("--texts", type=int, default=200, help="Number of sample texts to clean.")
+    args = parser.parse_args()
+    benchmark(texts=args.texts)
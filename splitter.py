@@ -1,6 +1,13 @@
 import os
+import csv
+import json
+import fcntl
 import logging
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from moviepy import VideoFileClip
+from media_probe import probe
 import argparse
 
 # ANSI escape codes for colored output
@@ -11,12 +18,55 @@ class Color:
     RESET = "\033[0m"  # Reset to default
 
 
+# Sidecar manifest mapping each clip to the source it was cut from
+MANIFEST_FILE = "clips_manifest.json"
+
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-def split_video(video_file, max_duration=600):
-    """Split the video into sections no longer than max_duration."""
+def record_manifest(clip_file, source_file, start_time, end_time, manifest_path=MANIFEST_FILE):
+    """Record in the sidecar manifest which source a clip was cut from, and where.
+
+    The read-modify-write holds an exclusive lock on a sidecar lock file, so
+    several processes cutting clips into one folder never drop entries.
+    """
+    with open(manifest_path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = {}
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, "r") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"{Color.WARNING}Could not read {manifest_path}, starting a new one: {e}{Color.RESET}")
+        # Sources in other folders are stored relative to the manifest so the chain stays resolvable
+        source = os.path.relpath(os.path.abspath(source_file), os.path.dirname(os.path.abspath(manifest_path)))
+        manifest[os.path.basename(clip_file)] = {
+            "source": source,
+            "start": round(float(start_time), 3),
+            "end": round(float(end_time), 3),
+        }
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+
+def split_video(video_file, max_duration=600, copy=False, exact=False, workers=1, threads=None):
+    """Split the video into sections no longer than max_duration.
+
+    With copy=True the video is cut on keyframes without re-encoding, so the
+    segments may run slightly past max_duration. Passing exact=True as well
+    falls back to re-encoding to hit the requested boundaries. With
+    workers > 1 re-encoded segments are rendered in parallel processes.
+    """
+    if copy and not exact:
+        return split_video_copy(video_file, max_duration)
+    if workers > 1:
+        return split_video_parallel(video_file, max_duration, workers, threads)
+
     clips_created = []
     try:
         with VideoFileClip(video_file) as clip:
@@ -45,6 +95,7 @@ def split_video(video_file, max_duration=600):
                     logging.info(
                         f"{Color.INFO}Created segment: {output_file} from {start_time} to {end_time}{Color.RESET}")
                     clips_created.append(output_file)
+                    record_manifest(output_file, video_file, start_time, end_time)
                 except Exception as e:
                     logging.error(f"{Color.ERROR}Error creating segment {output_file}: {e}{Color.RESET}")
 
@@ -57,14 +108,122 @@ def split_video(video_file, max_duration=600):
     return clips_created
 
 
-def main(video_file, max_duration):
-    split_video(video_file, max_duration)
+def split_video_copy(video_file, max_duration=600):
+    """Split the video on keyframes with ffmpeg's segment muxer, without re-encoding."""
+    clips_created = []
+    video_title = os.path.splitext(os.path.basename(video_file))[0]
+    output_pattern = f"{video_title}_part_%d.mp4"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        segment_list = os.path.join(tmp_dir, "segments.csv")
+        try:
+            result = subprocess.run([
+                "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                "-i", video_file,
+                "-map", "0:v:0", "-map", "0:a?",
+                "-c", "copy",
+                "-f", "segment",
+                "-segment_time", str(max_duration),
+                "-segment_list", segment_list,
+                "-segment_list_type", "csv",
+                "-reset_timestamps", "1",
+                output_pattern
+            ], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        except Exception as e:
+            logging.error(f"{Color.ERROR}Error running ffmpeg on {video_file}: {e}{Color.RESET}")
+            return clips_created
+
+        if result.returncode != 0:
+            logging.error(f"{Color.ERROR}Error splitting video {video_file}: {result.stderr.strip()}{Color.RESET}")
+            return clips_created
+
+        # The segment list holds the real cut points, which land on keyframes
+        with open(segment_list, newline='') as f:
+            for row in csv.reader(f):
+                if len(row) < 3:
+                    continue
+                output_file, start_time, end_time = row[0], float(row[1]), float(row[2])
+                logging.info(
+                    f"{Color.INFO}Created segment: {output_file} from {start_time:.3f} to {end_time:.3f} (keyframe cut){Color.RESET}")
+                clips_created.append(output_file)
+                record_manifest(output_file, video_file, start_time, end_time)
+
+    return clips_created
+
+
+def _encode_segment(video_file, start_time, end_time, output_file, threads):
+    """Encode one segment with its own ffmpeg process, capped at `threads` threads."""
+    result = subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-ss', f"{start_time:.6f}", '-t', f"{end_time - start_time:.6f}", '-i', video_file,
+        '-c:v', 'libx264', '-c:a', 'aac', '-threads', str(threads),
+        output_file
+    ], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"ffmpeg exited with code {result.returncode}")
+    return output_file
+
+
+def split_video_parallel(video_file, max_duration=600, workers=2, threads=None):
+    """Split the video by re-encoding each segment as an independent ffmpeg job."""
+    clips_created = []
+    if threads is None:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+
+    try:
+        total_duration = probe(video_file)["duration"]
+    except Exception as e:
+        logging.error(f"{Color.ERROR}Error splitting video {video_file}: {e}{Color.RESET}")
+        return clips_created
+
+    logging.info(f"{Color.INFO}Total duration of video: {total_duration:.2f} seconds{Color.RESET}")
+    logging.info(f"{Color.INFO}Encoding with {workers} workers, {threads} encoder threads each{Color.RESET}")
+
+    video_title = os.path.splitext(os.path.basename(video_file))[0]
+    jobs = []
+    start_time = 0
+    clip_count = 0
+    while start_time < total_duration:
+        end_time = min(start_time + max_duration, total_duration)
+        jobs.append((start_time, end_time, f"{video_title}_part_{clip_count}.mp4"))
+        start_time += max_duration
+        clip_count += 1
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_encode_segment, video_file, start_time, end_time, output_file, threads)
+            for start_time, end_time, output_file in jobs
+        ]
+        # Report in segment order, whatever order the workers finish in
+        for (start_time, end_time, output_file), future in zip(jobs, futures):
+            try:
+                future.result()
+                logging.info(
+                    f"{Color.INFO}Created segment: {output_file} from {start_time} to {end_time}{Color.RESET}")
+                clips_created.append(output_file)
+                record_manifest(output_file, video_file, start_time, end_time)
+            except Exception as e:
+                logging.error(f"{Color.ERROR}Error creating segment {output_file}: {e}{Color.RESET}")
+
+    return clips_created
+
+
+def main(video_file, max_duration, copy=False, exact=False, workers=1, threads=None):
+    split_video(video_file, max_duration, copy=copy, exact=exact, workers=workers, threads=threads)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Split a video into segments.")
     parser.add_argument('--video_file', type=str, required=True, help="Path to the video file to split.")
     parser.add_argument('--max_duration', type=int, default=600, help="Maximum duration of each segment in seconds.")
+    parser.add_argument('--copy', action='store_true',
+                        help="Cut on keyframes without re-encoding (segments may run slightly long).")
+    parser.add_argument('--exact', action='store_true',
+                        help="Re-encode to hit exact segment boundaries, even with --copy.")
+    parser.add_argument('--workers', type=int, default=1, help="Number of segments to re-encode in parallel.")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="Encoder threads per worker (defaults to CPU count divided by workers).")
 
     args = parser.parse_args()
-    main(args.video_file, args.max_duration)
\ No newline at end of file
+    main(args.video_file, args.max_duration, copy=args.copy, exact=args.exact,
+         workers=args.workers, threads=args.threads)
\ No newline at end of file
@@ -0,0 +1,97 @@
+import os
+import time
+import threading
+import functools
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("moviepy")
+pytest.importorskip("yt_dlp")
+
+import long_to_clips
+
+FILE_SIZE = 3 * 1024 * 1024
+MIN_FREE = 512 * 1024
+
+
+class SlowHandler(SimpleHTTPRequestHandler):
+    """Serves files in small timed chunks so concurrent downloads really overlap."""
+
+    def copyfile(self, source, outputfile):
+        for chunk in iter(lambda: source.read(256 * 1024), b""):
+            outputfile.write(chunk)
+            time.sleep(0.02)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def file_server(tmp_path):
+    """Serve two fake .webm files over HTTP; yields the base URL."""
+    served = tmp_path / "served"
+    served.mkdir()
+    for name in ("first.webm", "second.webm"):
+        (served / name).write_bytes(os.urandom(FILE_SIZE))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(SlowHandler, directory=str(served)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class FolderBudget(long_to_clips.DiskBudget):
+    """A budget on a simulated disk of `capacity` bytes that only holds the download folder."""
+
+    def __init__(self, folder, capacity):
+        super().__init__(folder, MIN_FREE, poll=0.01)
+        self.capacity = capacity
+        self.most_admitted = 0
+
+    def _free(self):
+        self.most_admitted = max(self.most_admitted, len(self.downloads))
+        used = sum(entry.stat().st_size for entry in os.scandir(self.path) if entry.is_file())
+        return self.capacity - used
+
+
+def _download_both(base_url, budget):
+    """Download both files at once; each is moved off the simulated disk once done, as a split would."""
+    sizes = {}
+
+    def fetch(name):
+        video_file = long_to_clips.download_video(f"{base_url}/{name}.webm", budget.path, budget=budget)
+        sizes[name] = os.path.getsize(video_file)
+        os.remove(video_file)
+
+    threads = [threading.Thread(target=fetch, args=(name,)) for name in ("first", "second")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    return sizes
+
+
+def test_downloads_wait_for_reserved_space(file_server, tmp_path):
+    out = tmp_path / "out"
+    out.mkdir()
+    # Room for one file above the floor, not two
+    budget = FolderBudget(str(out), FILE_SIZE + MIN_FREE + FILE_SIZE // 2)
+    sizes = _download_both(file_server, budget)
+
+    assert budget.most_admitted == 1
+    assert budget.downloads == {}
+    assert sizes == {"first": FILE_SIZE, "second": FILE_SIZE}
+
+
+def test_downloads_overlap_when_space_allows(file_server, tmp_path):
+    out = tmp_path / "out"
+    out.mkdir()
+    budget = FolderBudget(str(out), 2 * FILE_SIZE + MIN_FREE)
+    sizes = _download_both(file_server, budget)
+
+    assert budget.most_admitted == 2
+    assert sizes == {"first": FILE_SIZE, "second": FILE_SIZE}
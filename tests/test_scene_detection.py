@@ -0,0 +1,37 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("moviepy")
+pytest.importorskip("yt_dlp")
+
+import long_to_clips
+
+FPS = 25
+CUT_FRAMES = [30, 74, 120]
+FRAME_COUNT = 160
+
+
+@pytest.fixture
+def synthetic_clip(tmp_path):
+    """A clip of flat gray scenes with hard cuts at CUT_FRAMES."""
+    path = str(tmp_path / "cuts.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), FPS, (320, 180))
+    shades = [40, 200, 90, 240]
+    for index in range(FRAME_COUNT):
+        scene = sum(index >= cut for cut in CUT_FRAMES)
+        writer.write(np.full((180, 320, 3), shades[scene], dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def test_fast_detector_finds_known_cuts(synthetic_clip):
+    scenes = long_to_clips.detect_scenes_fast(synthetic_clip)
+    assert scenes == pytest.approx([frame / FPS for frame in CUT_FRAMES])
+
+
+@pytest.mark.parametrize("chunks", [2, 3, 7])
+def test_chunked_detector_matches_fast(synthetic_clip, chunks):
+    expected = long_to_clips.detect_scenes_fast(synthetic_clip)
+    scenes = long_to_clips.detect_scenes_chunked(synthetic_clip, workers=2, chunks=chunks)
+    assert scenes == pytest.approx(expected)
@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import threading
+import functools
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+pytest.importorskip("httplib2")
+pytest.importorskip("googleapiclient")
+pytest.importorskip("google_auth_oauthlib")
+
+import upload_journal
+import upload_scheduler
+import youtube_upload_shorts
+from upload_scheduler import TokenBucket, run_uploads
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_spaces_slots_by_interval():
+    clock = FakeClock()
+    bucket = TokenBucket(300, clock=clock)
+    assert [bucket.reserve() - clock.now for _ in range(4)] == [0, 300, 600, 900]
+
+
+def test_bucket_allows_burst_then_spaces():
+    clock = FakeClock()
+    bucket = TokenBucket(300, burst=3, clock=clock)
+    assert [bucket.reserve() - clock.now for _ in range(5)] == [0, 0, 0, 300, 600]
+
+
+def test_bucket_refills_while_idle():
+    clock = FakeClock()
+    bucket = TokenBucket(300, burst=2, clock=clock)
+    for _ in range(4):
+        bucket.reserve()
+    clock.now += 3600
+    assert [bucket.reserve() - clock.now for _ in range(3)] == [0, 0, 300]
+
+
+def test_publish_at_is_immediate_for_near_slots():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock)
+    assert bucket.publish_at() is None
+    assert bucket.publish_at() is None  # 60 s ahead is under MIN_SCHEDULE_AHEAD
+    assert bucket.publish_at() == datetime.fromtimestamp(clock.now + 120, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def test_run_uploads_caps_transfers_and_reports_errors():
+    lock = threading.Lock()
+    active = [0, 0]  # current, most seen
+
+    def upload(job):
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        if job == 3:
+            raise RuntimeError("rejected")
+        return f"id{job}"
+
+    results = {job: (result, error) for job, result, error in run_uploads(range(8), upload, in_flight=3)}
+    assert active[1] == 3
+    assert sorted(results) == list(range(8))
+    assert str(results[3][1]) == "rejected"
+    assert results[5] == ("id5", None)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Just enough of the YouTube resumable upload protocol for videos.insert."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            session = len(self.server.inserts)
+            self.server.inserts.append(body)
+        self.send_response(200)
+        self.send_header("Location", f"http://{self.headers['Host']}/session/{session}")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_PUT(self):
+        with self.server.lock:
+            self.server.active += 1
+            self.server.most_active = max(self.server.most_active, self.server.active)
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(0.2)
+        with self.server.lock:
+            self.server.active -= 1
+        payload = json.dumps({"id": f"video{self.path.rsplit('/', 1)[1]}"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.lock = threading.Lock()
+    server.inserts = []
+    server.active = 0
+    server.most_active = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def shorts_folder(tmp_path, monkeypatch):
+    folder = tmp_path / "Shorts"
+    folder.mkdir()
+    titles = {}
+    for index in range(4):
+        (folder / f"short_{index}.mp4").write_bytes(os.urandom(64 * 1024))
+        titles[f"short_{index}.mp4"] = f"Title {index}"
+    (folder / "titles.json").write_text(json.dumps(titles))
+    (folder / "description.txt").write_text("A description")
+
+    data = tmp_path / "data"
+    monkeypatch.setattr(youtube_upload_shorts, "UploadJournal",
+                        functools.partial(upload_journal.UploadJournal, str(data / "uploads.db")))
+    monkeypatch.setattr(youtube_upload_shorts, "UPLOAD_SESSIONS", str(data / "upload_sessions.json"))
+    monkeypatch.setattr(upload_scheduler, "_local", threading.local())
+    return str(folder)
+
+
+def test_uploads_against_stand_in(stand_in, shorts_folder):
+    endpoint = f"http://127.0.0.1:{stand_in.server_address[1]}/"
+    youtube_upload_shorts.main(shorts_folder, in_flight=2, publish_interval=600, burst=2, api_endpoint=endpoint)
+
+    assert len(stand_in.inserts) == 4
+    assert stand_in.most_active == 2
+    publish_times = sorted(body["status"].get("publishAt", "") for body in stand_in.inserts)
+    assert publish_times[:2] == ["", ""]
+    first, second = (datetime.strptime(stamp, "%Y-%m-%dT%H:%M:%SZ") for stamp in publish_times[2:])
+    assert (second - first).total_seconds() == 600
+
+    # Everything is in the journal now, so a second run uploads nothing
+    youtube_upload_shorts.main(shorts_folder, in_flight=2, api_endpoint=endpoint)
+    assert len(stand_in.inserts) == 4
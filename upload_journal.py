@@ -0,0 +1,130 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from media_cache import file_fingerprint
+
+# Upload state lives outside the working directory so every run sees the same journal
+DATA_DIR = os.environ.get("TERMUXTUBE_DATA", os.path.expanduser("~/.local/share/termuxtube"))
+JOURNAL_PATH = os.path.join(DATA_DIR, "uploads.db")
+STATES = ("queued", "uploading", "done", "failed")
+SCHEMA_VERSION = 1  # 1: uploads keyed by content hash instead of the mtime-bearing cache fingerprint
+
+
+def content_hash(path, block_size=1024 * 1024):
+    """sha256 of the file's bytes, so copies, restores and touched files keep their key."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class UploadJournal:
+    """SQLite journal of uploads keyed by a hash of the file contents.
+
+    Each state change is one indexed UPSERT plus an appended transition row,
+    committed on its own, so a crash loses at most the change in flight.
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS uploads (
+                fingerprint TEXT PRIMARY KEY,
+                path TEXT,
+                state TEXT NOT NULL,
+                video_id TEXT,
+                error TEXT,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS transitions (
+                fingerprint TEXT NOT NULL,
+                state TEXT NOT NULL,
+                at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                fingerprint TEXT NOT NULL
+            );
+        """)
+        self._migrate()
+
+    def _migrate(self):
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        # Rekey rows written under the old fingerprint when their file is still there unchanged;
+        # rows whose file moved or changed can no longer be matched and are left as history
+        rows = self.db.execute("SELECT fingerprint, path FROM uploads").fetchall()
+        with self.db:
+            for old, path in rows:
+                try:
+                    if not path or file_fingerprint(path) != old:
+                        continue
+                    new = content_hash(path)
+                except OSError:
+                    continue
+                existing = self.db.execute("SELECT state FROM uploads WHERE fingerprint = ?", (new,)).fetchone()
+                if existing and existing[0] == "done":
+                    # A copy of the same file already carries the upload
+                    self.db.execute("DELETE FROM uploads WHERE fingerprint = ?", (old,))
+                    continue
+                self.db.execute("DELETE FROM uploads WHERE fingerprint = ?", (new,))
+                self.db.execute("UPDATE uploads SET fingerprint = ? WHERE fingerprint = ?", (new, old))
+                self.db.execute("UPDATE transitions SET fingerprint = ? WHERE fingerprint = ?", (new, old))
+            self.db.execute("DELETE FROM files")
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def fingerprint(self, path):
+        """Return the content hash of path; the stat index only saves re-hashing unchanged files."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self.lock:
+            row = self.db.execute("SELECT size, mtime_ns, fingerprint FROM files WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+        fingerprint = content_hash(path)
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, fingerprint) VALUES (?, ?, ?, ?)",
+                            (path, stat.st_size, stat.st_mtime_ns, fingerprint))
+        return fingerprint
+
+    def get(self, fingerprint):
+        """Return the entry for a file as a dict, or None if it was never queued."""
+        with self.lock:
+            row = self.db.execute("SELECT path, state, video_id, error, updated FROM uploads WHERE fingerprint = ?",
+                                  (fingerprint,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("path", "state", "video_id", "error", "updated"), row))
+
+    def mark(self, fingerprint, state, path=None, video_id=None, error=None):
+        """Record a state transition; path and video_id keep their old values when not given."""
+        if state not in STATES:
+            raise ValueError(f"Unknown upload state: {state}")
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute("""
+                INSERT INTO uploads (fingerprint, path, state, video_id, error, updated)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(fingerprint) DO UPDATE SET
+                    path = COALESCE(excluded.path, path),
+                    state = excluded.state,
+                    video_id = COALESCE(excluded.video_id, video_id),
+                    error = excluded.error,
+                    updated = excluded.updated
+            """, (fingerprint, path, state, video_id, error, now))
+            self.db.execute("INSERT INTO transitions (fingerprint, state, at) VALUES (?, ?, ?)",
+                            (fingerprint, state, now))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import random
+import threading
+import urllib.parse
+import httplib2
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Slots closer than this are published straight away instead of scheduled
+MIN_SCHEDULE_AHEAD = 120
+
+# Resumable chunks must be multiples of 256 KiB; aim for one chunk every few seconds
+CHUNK_UNIT = 256 * 1024
+INITIAL_CHUNK = 16 * CHUNK_UNIT
+MAX_CHUNK = 256 * CHUNK_UNIT
+TARGET_CHUNK_SECONDS = 8
+RETRY_STATUSES = (500, 502, 503, 504)
+
+_local = threading.local()
+
+
+class TokenBucket:
+    """Hands out publish slots: `burst` at once, then one every `interval` seconds.
+
+    Slots are reserved in virtual time, so callers never sleep; the upload
+    carries its slot as a YouTube publishAt time instead.
+    """
+
+    def __init__(self, interval, burst=1, clock=time.time):
+        self.interval = max(0, interval)
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.tat = 0  # Theoretical arrival time of the next token
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Consume a token and return the timestamp at which it becomes available."""
+        with self.lock:
+            now = self.clock()
+            slot = max(now, self.tat - (self.burst - 1) * self.interval)
+            self.tat = max(self.tat, now) + self.interval
+            return slot
+
+    def publish_at(self):
+        """Reserve a slot as an RFC 3339 publishAt string, or None to publish immediately."""
+        slot = self.reserve()
+        if slot - self.clock() < MIN_SCHEDULE_AHEAD:
+            return None
+        return datetime.fromtimestamp(slot, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def thread_service(factory):
+    """Return this thread's API client, building it on first use (clients are not thread safe)."""
+    if not hasattr(_local, "service"):
+        _local.service = factory()
+    return _local.service
+
+
+def endpoint_request(api_endpoint):
+    """HttpRequest class that keeps every call on api_endpoint's scheme.
+
+    client_options only swaps the host, so media uploads would still go out
+    over https; a plain-http test server needs the scheme rewritten too.
+    """
+    scheme = urllib.parse.urlparse(api_endpoint).scheme
+
+    class EndpointRequest(HttpRequest):
+        def __init__(self, http, postproc, uri, *args, **kwargs):
+            uri = urllib.parse.urlparse(uri)._replace(scheme=scheme).geturl()
+            super().__init__(http, postproc, uri, *args, **kwargs)
+
+    return EndpointRequest
+
+
+def run_uploads(jobs, upload, in_flight=2):
+    """Run upload(job) for every job with at most in_flight transfers at once.
+
+    Yields (job, result, error) as each transfer finishes, in completion order.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, in_flight)) as pool:
+        futures = {pool.submit(upload, job): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                yield job, future.result(), None
+            except Exception as e:
+                yield job, None, e
+
+
+class SessionStore:
+    """Resumable upload session URIs and confirmed offsets, persisted across restarts."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, "r") as f:
+                self.sessions = json.load(f)
+        except (OSError, ValueError):
+            self.sessions = {}
+
+    def get(self, key):
+        with self.lock:
+            return self.sessions.get(key)
+
+    def put(self, key, uri, offset):
+        with self.lock:
+            self.sessions[key] = {"uri": uri, "offset": offset}
+            self._save()
+
+    def drop(self, key):
+        with self.lock:
+            if self.sessions.pop(key, None) is not None:
+                self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.sessions, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def session_key(video_path):
+    """Identify a file by path, size and mtime so an edited file never resumes an old session."""
+    stat = os.stat(video_path)
+    return f"{os.path.abspath(video_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def adapt_chunksize(sent, elapsed):
+    """Size the next chunk to take about TARGET_CHUNK_SECONDS at the measured throughput."""
+    size = int(sent / max(elapsed, 1e-3) * TARGET_CHUNK_SECONDS) // CHUNK_UNIT * CHUNK_UNIT
+    return min(MAX_CHUNK, max(CHUNK_UNIT, size))
+
+
+def resumable_execute(request, media, key, sessions, max_retries=8):
+    """Upload with next_chunk(), resuming a saved session and retrying transient errors with backoff."""
+    saved = sessions.get(key)
+    if saved:
+        # With a known URI in the error state, next_chunk() first asks the server how much it has
+        request.resumable_uri = saved["uri"]
+        request._in_error_state = True
+        print(f"[+] Resuming upload from byte {saved['offset']}: {key.rsplit(':', 2)[0]}")
+
+    response = None
+    retries = 0
+    while response is None:
+        # After a resume or an error, next_chunk() first asks the server for its offset, so the
+        # progress jump includes bytes sent in earlier attempts and says nothing about throughput
+        measure = not request._in_error_state
+        offset = request.resumable_progress
+        started = time.monotonic()
+        try:
+            _, response = request.next_chunk()
+        except HttpError as e:
+            if saved and e.resp.status in (404, 410):
+                # The saved session expired; start a fresh one
+                print(f"[!] Upload session expired, restarting: {key.rsplit(':', 2)[0]}")
+                sessions.drop(key)
+                saved = None
+                request.resumable_uri = None
+                request.resumable_progress = 0
+                request._in_error_state = False
+                continue
+            if e.resp.status not in RETRY_STATUSES or retries >= max_retries:
+                raise
+            retries += 1
+        except (OSError, httplib2.HttpLib2Error):
+            if retries >= max_retries:
+                raise
+            retries += 1
+        else:
+            retries = 0
+            if response is None:
+                sessions.put(key, request.resumable_uri, request.resumable_progress)
+                sent = request.resumable_progress - offset
+                if measure and sent > 0:
+                    media._chunksize = adapt_chunksize(sent, time.monotonic() - started)
+            continue
+
+        delay = min(60, 2 ** retries) + random.random()
+        print(f"[!] Transient upload error, retry {retries}/{max_retries} in {delay:.0f}s")
+        time.sleep(delay)
+
+    sessions.drop(key)
+    return response
@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+import os
+import io
+import json
+import queue
+import re
+import socket
+import subprocess
+import threading
+import time
+import uuid
+import wave
+import urllib.error
+import urllib.request
+import numpy as np
+from media_cache import file_fingerprint, cache_key, cache_load, cache_store
+
+WHISPER_SERVER_BIN = os.path.expanduser("~/whisper.cpp/build/bin/whisper-server")
+SAMPLE_RATE = 16000
+SNIPPET_SECONDS = 10
+# How much of each clip the voice-activity pass looks at
+VAD_SCAN_SECONDS = 60
+TRANSCRIPT_CACHE = "transcripts"
+SOURCE_CACHE = "source_transcripts"
+# Sources are transcribed in chunks of this length (about 19 MB of PCM each)
+SOURCE_CHUNK_SECONDS = 600
+# Written by long_to_clips.py / splitter.py: {clip: {"source": file, "start": s, "end": e}}
+MANIFEST_FILE = "clips_manifest.json"
+# whisper-cli segment lines: "[00:00:01.000 --> 00:00:03.500]  text"
+SEGMENT_LINE = re.compile(r"^\[(\d+:\d+:[\d.]+) --> (\d+:\d+:[\d.]+)\]\s*(.*)$", re.MULTILINE)
+
+
+def extract_audio_pcm(video_path, seconds=SNIPPET_SECONDS, start=0):
+    """Return `seconds` of audio from `start` (all of it for None) as 16 kHz mono s16le PCM, or None if ffmpeg fails."""
+    seek = ["-ss", str(start)] if start else []
+    limit = ["-t", str(seconds)] if seconds else []
+    try:
+        result = subprocess.run([
+            "ffmpeg"
+        ] + seek + ["-i", video_path] + limit + [
+            "-vn", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-ac", "1",
+            "-f", "s16le", "-"
+        ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except Exception as e:
+        print(f"[!] ffmpeg error: {e}")
+        return None
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return result.stdout
+
+
+def find_speech_window(pcm, seconds=SNIPPET_SECONDS, frame=0.03, min_ratio=0.6):
+    """Return where (in seconds) the speech in the first dense-speech window of `seconds` starts.
+
+    Frames are marked as speech when their energy is well above the clip's
+    noise floor with a voice-like zero-crossing rate. If no window reaches
+    min_ratio speech frames, the densest window is used instead.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+    frame_len = int(SAMPLE_RATE * frame)
+    count = len(samples) // frame_len
+    window = int(seconds / frame)
+    if count <= window:
+        return 0.0
+
+    frames = samples[:count * frame_len].reshape(count, frame_len)
+    energy = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    crossings = np.mean(np.abs(np.diff(np.signbit(frames).astype(np.int8), axis=1)), axis=1)
+    speech = (energy > np.percentile(energy, 10) + 10) & (crossings < 0.3)
+
+    # Speech frames in every window, from prefix sums
+    prefix = np.concatenate(([0], np.cumsum(speech)))
+    ratio = (prefix[window:] - prefix[:-window]) / window
+    dense = np.flatnonzero(ratio >= min_ratio)
+    start = dense[0] if len(dense) else int(np.argmax(ratio))
+    # The first qualifying window can open with up to (1 - min_ratio) of silence; start at its first speech
+    voiced = np.flatnonzero(speech[start:start + window])
+    if len(voiced):
+        start += int(voiced[0])
+    return start * frame
+
+
+def clip_snippet(video_path, vad=False):
+    """Return the PCM to transcribe for a clip: its opening seconds, or its first speech with vad=True."""
+    if not vad:
+        return extract_audio_pcm(video_path)
+
+    pcm = extract_audio_pcm(video_path, VAD_SCAN_SECONDS)
+    if pcm is None:
+        return None
+    started = time.perf_counter()
+    offset = find_speech_window(pcm)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"      ↪ VAD: speech at {offset:.1f}s ({elapsed:.1f} ms)")
+    start = int(offset * SAMPLE_RATE) * 2
+    return pcm[start:start + SNIPPET_SECONDS * SAMPLE_RATE * 2]
+
+
+def pcm_to_wav(pcm):
+    """Wrap 16 kHz mono s16le PCM in an in-memory WAV container."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(SAMPLE_RATE)
+        out.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def _run_whisper_cli(wav_data, whisper_bin, model, threads=None, timestamps=False, extra_args=()):
+    """Feed a WAV to whisper-cli on stdin and return what it prints on stdout."""
+    command = [whisper_bin, "-m", model, "-f", "-", "-np"] + list(extra_args)
+    if not timestamps:
+        command.append("-nt")
+    if threads:
+        command += ["-t", str(threads)]
+    result = subprocess.run(command, input=wav_data, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    return result.stdout.decode("utf-8", errors="replace")
+
+
+def whisper_transcribe(pcm, whisper_bin, model, worker=None, threads=None):
+    """Transcribe PCM bytes through the resident worker if there is one, else a whisper-cli run."""
+    wav_data = pcm_to_wav(pcm)
+    if worker:
+        try:
+            return worker.transcribe(wav_data)
+        except Exception as e:
+            print(f"[!] Whisper worker error: {e}")
+            return ""
+    try:
+        return _run_whisper_cli(wav_data, whisper_bin, model, threads).strip()
+    except Exception as e:
+        print(f"[!] Whisper error: {e}")
+    return ""
+
+
+def transcribe_batch(snippets, whisper_bin, model, gap=2.0):
+    """Transcribe many 16 kHz mono PCM snippets in one whisper run.
+
+    The snippets are joined into a single stream with `gap` seconds of
+    silence between them, transcribed once with word timestamps, and each
+    word is given back to the snippet its midpoint falls in, so a segment
+    that runs across a gap is still split between its two snippets.
+    """
+    silence = b"\0\0" * int(gap * SAMPLE_RATE)
+    ranges = []
+    position = 0.0
+    for pcm in snippets:
+        duration = len(pcm) / (2 * SAMPLE_RATE)
+        ranges.append((position, position + duration))
+        position += duration + gap
+
+    try:
+        output = _run_whisper_cli(pcm_to_wav(silence.join(snippets)), whisper_bin, model, timestamps=True,
+                                  extra_args=["-ml", "1", "-sow"])
+    except Exception as e:
+        print(f"[!] Whisper batch error: {e}")
+        return [""] * len(snippets)
+
+    texts = [[] for _ in snippets]
+    for match in SEGMENT_LINE.finditer(output):
+        middle = (_seconds(match.group(1)) + _seconds(match.group(2))) / 2
+        for index, (start, end) in enumerate(ranges):
+            if start <= middle <= end + gap / 2:
+                texts[index].append(match.group(3).strip())
+                break
+    return [" ".join(t for t in parts if t) for parts in texts]
+
+
+def _seconds(stamp):
+    hours, minutes, seconds = stamp.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def _free_port(host):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+class WhisperServer:
+    """A resident whisper.cpp server: the model is loaded once and clips are sent over a local socket.
+
+    If the server process dies or stops accepting connections it is
+    restarted (up to max_restarts times) and the clip is sent again. An
+    HTTP error response fails only the clip that caused it.
+    """
+
+    def __init__(self, model, server_bin=WHISPER_SERVER_BIN, host="127.0.0.1", threads=None,
+                 max_restarts=3, startup_timeout=120, request_timeout=300):
+        self.model = model
+        self.server_bin = server_bin
+        self.host = host
+        self.threads = threads
+        self.max_restarts = max_restarts
+        self.startup_timeout = startup_timeout
+        self.request_timeout = request_timeout
+        self.process = None
+        self.port = None
+        self.restarts = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.port = _free_port(self.host)
+        command = [self.server_bin, "-m", self.model, "--host", self.host, "--port", str(self.port)]
+        if self.threads:
+            command += ["-t", str(self.threads)]
+        self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # The server only listens once the model is loaded
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"whisper-server exited during startup (code {self.process.returncode})")
+            try:
+                with socket.create_connection((self.host, self.port), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError("whisper-server did not start in time")
+
+    def stop(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+    def transcribe(self, wav_data):
+        """Return the transcript of in-memory 16 kHz WAV data, restarting the server if it has crashed."""
+        for _ in range(self.max_restarts + 1):
+            if not self.alive():
+                if self.process is not None:
+                    print("[!] Whisper worker exited, restarting...")
+                    self.restarts += 1
+                self.stop()
+                self.start()
+            try:
+                return self._post(wav_data)
+            except urllib.error.HTTPError as e:
+                # The server answered, so it is healthy; only this clip failed
+                print(f"[!] Whisper worker rejected clip: {e}")
+                return ""
+            except (urllib.error.URLError, ConnectionError, socket.timeout) as e:
+                print(f"[!] Whisper worker error: {e}, restarting...")
+                self.stop()
+                self.restarts += 1
+        return ""
+
+    def _post(self, wav_data):
+        boundary = uuid.uuid4().hex
+        body = b"".join([
+            f"--{boundary}\r\n".encode(),
+            b'Content-Disposition: form-data; name="response_format"\r\n\r\ntext\r\n',
+            f"--{boundary}\r\n".encode(),
+            b'Content-Disposition: form-data; name="file"; filename="clip.wav"\r\n',
+            b"Content-Type: audio/wav\r\n\r\n",
+            wav_data,
+            f"\r\n--{boundary}--\r\n".encode(),
+        ])
+        request = urllib.request.Request(
+            f"http://{self.host}:{self.port}/inference", data=body,
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+        with urllib.request.urlopen(request, timeout=self.request_timeout) as response:
+            return response.read().decode("utf-8", errors="replace").strip()
+
+
+def _start_worker(model, threads=None):
+    """Start a resident whisper-server if one is installed, else return None to use whisper-cli."""
+    if not os.path.exists(WHISPER_SERVER_BIN):
+        return None
+    try:
+        worker = WhisperServer(model, threads=threads)
+        worker.start()
+        print(f"[+] Whisper worker started ({threads or 'default'} threads)")
+        return worker
+    except Exception as e:
+        print(f"[!] Whisper worker unavailable, using whisper-cli: {e}")
+        return None
+
+
+def transcript_key(video_path, model, vad=False, seconds=SNIPPET_SECONDS, source=False):
+    """Cache key for a clip's transcript: file fingerprint, model and snippet parameters.
+
+    Text sliced from a source transcript (source=True) is kept apart from
+    snippet transcripts, so runs without --from_sources never reuse it.
+    """
+    params = {"model": os.path.abspath(model), "seconds": seconds, "rate": SAMPLE_RATE}
+    if source:
+        params["source"] = True
+    else:
+        params["vad"] = vad
+    return cache_key(file_fingerprint(video_path), **params)
+
+
+def cached_transcript(video_path, model, vad=False, use_sources=False):
+    """Return the cached transcript for an unchanged clip, or None."""
+    keys = [transcript_key(video_path, model, vad)]
+    if use_sources:
+        keys.insert(0, transcript_key(video_path, model, source=True))
+    for key in keys:
+        entry = cache_load(TRANSCRIPT_CACHE, key)
+        if entry:
+            return entry["text"]
+    return None
+
+
+def load_manifest(folder_path):
+    """Return the clip manifest in folder_path, or an empty one."""
+    path = os.path.join(folder_path, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[!] Could not read {path}: {e}")
+        return {}
+
+
+def resolve_source(manifest, folder_path, file, manifests=None):
+    """Return (source_path, offset) for the root-most source of `file` still on disk, or None.
+
+    The chain is followed to its end, so shorts and the parts they were cut
+    from all map onto the original download and share one transcription.
+    Offsets compose along the chain, e.g. a short cut at 30 s from a part
+    that starts at 600 s of the download sits at 630 s of the download.
+    Sources in other folders are looked up in that folder's manifest;
+    pass a dict as `manifests` to reuse loaded manifests across calls.
+    """
+    folder_path = os.path.abspath(folder_path)
+    manifests = {} if manifests is None else manifests
+    manifests.setdefault(folder_path, manifest)
+    offset = 0.0
+    current = os.path.join(folder_path, file)
+    seen = set()
+    found = None
+    while current not in seen:
+        seen.add(current)
+        folder = os.path.dirname(current)
+        if folder not in manifests:
+            manifests[folder] = load_manifest(folder)
+        entry = manifests[folder].get(os.path.basename(current))
+        if entry is None:
+            break
+        offset += entry["start"]
+        current = os.path.normpath(os.path.join(folder, entry["source"]))
+        if os.path.exists(current):
+            found = (current, offset)
+    return found
+
+
+def source_words(source_path, whisper_bin, model, threads=None, chunk_seconds=SOURCE_CHUNK_SECONDS):
+    """Transcribe a whole source once with word timestamps; returns [(start, end, word)].
+
+    The audio is decoded and transcribed `chunk_seconds` at a time, so
+    memory stays bounded for multi-hour sources. Each chunk is cached on
+    its own, so an interrupted run resumes at the first missing chunk.
+    """
+    fingerprint = file_fingerprint(source_path)
+    words = []
+    start = 0
+    while True:
+        key = cache_key(fingerprint, model=os.path.abspath(model), rate=SAMPLE_RATE, start=start,
+                        seconds=chunk_seconds)
+        chunk = cache_load(SOURCE_CACHE, key)
+        if chunk is None:
+            print(f"    → Transcribing source: {os.path.basename(source_path)} from {start}s")
+            pcm = extract_audio_pcm(source_path, seconds=chunk_seconds, start=start)
+            if pcm is None:
+                break  # Past the end of the audio, or ffmpeg failed
+            try:
+                output = _run_whisper_cli(pcm_to_wav(pcm), whisper_bin, model, threads, timestamps=True,
+                                          extra_args=["-ml", "1", "-sow"])
+            except Exception as e:
+                print(f"[!] Whisper error: {e}")
+                return []
+            chunk = {
+                "words": [[start + _seconds(m.group(1)), start + _seconds(m.group(2)), m.group(3).strip()]
+                          for m in SEGMENT_LINE.finditer(output) if m.group(3).strip()],
+                "last": len(pcm) < chunk_seconds * SAMPLE_RATE * 2,
+            }
+            del pcm
+            cache_store(SOURCE_CACHE, key, chunk)
+        words += chunk["words"]
+        if chunk["last"]:
+            break
+        start += chunk_seconds
+    return words
+
+
+def _transcribe_from_sources(folder_path, files, whisper_bin, model):
+    """Slice transcripts for clips whose source is known from the manifest; other clips are left out."""
+    manifest = load_manifest(folder_path)
+    by_source = {}
+    manifests = {}
+    for file in files:
+        resolved = resolve_source(manifest, folder_path, file, manifests)
+        if resolved:
+            by_source.setdefault(resolved[0], []).append((file, resolved[1]))
+
+    transcripts = {}
+    for source_path, clips in by_source.items():
+        # One inference pass serves every clip cut from this source
+        words = source_words(source_path, whisper_bin, model)
+        if not words:
+            continue
+        for file, offset in clips:
+            window_end = offset + SNIPPET_SECONDS
+            transcripts[file] = " ".join(word for start, end, word in words
+                                         if offset <= (start + end) / 2 < window_end)
+    return transcripts
+
+
+def transcribe_clips(folder_path, files, whisper_bin, model, batch_size=1, max_batch_seconds=600,
+                     extractors=2, whisper_workers=1, whisper_threads=None, use_cache=True, vad=False,
+                     use_sources=False):
+    """Return {file: transcript} for video files in folder_path; None marks an ffmpeg failure.
+
+    Transcripts are cached by file fingerprint, model and snippet
+    parameters, so only new or changed clips reach whisper. With
+    batch_size > 1, up to batch_size snippets (and at most
+    max_batch_seconds of audio, which bounds memory use) go to each whisper
+    run. Otherwise snippets are extracted by `extractors` ffmpeg threads into
+    a bounded queue and transcribed by `whisper_workers` whisper processes
+    of `whisper_threads` threads each, capped so the total does not exceed
+    the number of cores. Audio is piped through memory; nothing is written
+    to the media folder. With vad=True the snippet starts at the clip's
+    first dense speech instead of at zero. With use_sources=True, clips
+    listed in the folder's clips_manifest.json take their text from a
+    single word-timestamped transcription of their source.
+    """
+    transcripts = {}
+    keys = {}
+    source_keys = {}
+    todo = []
+    for file in files:
+        if use_cache:
+            path = os.path.join(folder_path, file)
+            keys[file] = transcript_key(path, model, vad)
+            lookups = [keys[file]]
+            if use_sources:
+                source_keys[file] = transcript_key(path, model, source=True)
+                lookups.insert(0, source_keys[file])
+            entry = next(filter(None, (cache_load(TRANSCRIPT_CACHE, key) for key in lookups)), None)
+            if entry:
+                transcripts[file] = entry["text"]
+                continue
+        todo.append(file)
+    if len(todo) < len(files):
+        print(f"[+] Using {len(files) - len(todo)} cached transcripts, {len(todo)} clips to transcribe")
+
+    results = {}
+    from_sources = {}
+    if use_sources:
+        from_sources = _transcribe_from_sources(folder_path, todo, whisper_bin, model)
+        results.update(from_sources)
+        todo = [file for file in todo if file not in results]
+        print(f"[+] {len(results)} clips titled from source transcripts")
+
+    # Nothing left after the cache and sources means no whisper run at all
+    if todo and batch_size > 1:
+        results.update(_transcribe_batched(folder_path, todo, whisper_bin, model, batch_size, max_batch_seconds,
+                                           vad))
+    elif todo:
+        results.update(_transcribe_pipelined(folder_path, todo, whisper_bin, model, extractors, whisper_workers,
+                                             whisper_threads, vad))
+
+    for file, text in results.items():
+        # Empty text may be a whisper failure, so it is retried next run
+        if text and file in keys:
+            key = source_keys[file] if file in from_sources else keys[file]
+            cache_store(TRANSCRIPT_CACHE, key, {"text": text})
+    transcripts.update(results)
+    return transcripts
+
+
+def _transcribe_batched(folder_path, files, whisper_bin, model, batch_size, max_batch_seconds, vad):
+    transcripts = {}
+    batch = []
+    batch_seconds = 0.0
+
+    def flush():
+        print(f"    → Transcribing batch of {len(batch)} clips ({batch_seconds:.0f}s of audio)")
+        texts = transcribe_batch([pcm for _, pcm in batch], whisper_bin, model)
+        transcripts.update((file, text) for (file, _), text in zip(batch, texts))
+
+    for file in files:
+        print(f"    → Extracting: {file}")
+        pcm = clip_snippet(os.path.join(folder_path, file), vad)
+        if pcm is None:
+            transcripts[file] = None
+            continue
+        batch.append((file, pcm))
+        batch_seconds += len(pcm) / (2 * SAMPLE_RATE)
+        if len(batch) >= batch_size or batch_seconds >= max_batch_seconds:
+            flush()
+            batch = []
+            batch_seconds = 0.0
+    if batch:
+        flush()
+    return transcripts
+
+
+def _transcribe_pipelined(folder_path, files, whisper_bin, model, extractors, whisper_workers, whisper_threads,
+                          vad):
+    if not files:
+        return {}
+    cores = os.cpu_count() or 1
+    whisper_workers = max(1, min(whisper_workers, cores))
+    threads = max(1, min(whisper_threads or cores // whisper_workers, cores // whisper_workers))
+    print(f"[+] Pipeline: {extractors} extractors, {whisper_workers} whisper workers x {threads} threads")
+
+    transcripts = {}
+    pending = queue.Queue()
+    for file in files:
+        pending.put(file)
+    # Bounded so extraction never runs far ahead of transcription
+    ready = queue.Queue(maxsize=whisper_workers * 2)
+
+    def extract():
+        while True:
+            try:
+                file = pending.get_nowait()
+            except queue.Empty:
+                return
+            print(f"    → Extracting: {file}")
+            pcm = clip_snippet(os.path.join(folder_path, file), vad)
+            if pcm is None:
+                transcripts[file] = None
+            else:
+                ready.put((file, pcm))
+
+    def transcribe():
+        # The model is loaded on the first clip, so a worker with nothing to do costs nothing
+        worker = None
+        started = False
+        try:
+            while True:
+                item = ready.get()
+                if item is None:
+                    return
+                if not started:
+                    worker = _start_worker(model, threads)
+                    started = True
+                file, pcm = item
+                print(f"    → Transcribing: {file}")
+                transcripts[file] = whisper_transcribe(pcm, whisper_bin, model, worker, threads)
+        finally:
+            if worker:
+                worker.stop()
+
+    extract_threads = [threading.Thread(target=extract) for _ in range(max(1, extractors))]
+    transcribe_threads = [threading.Thread(target=transcribe) for _ in range(whisper_workers)]
+    for thread in extract_threads + transcribe_threads:
+        thread.start()
+    for thread in extract_threads:
+        thread.join()
+    for _ in transcribe_threads:
+        ready.put(None)
+    for thread in transcribe_threads:
+        thread.join()
+    return transcripts
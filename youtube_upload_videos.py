@@ -2,19 +2,30 @@
 
 import os
 import json
-import sys
-import time
+import argparse
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
+from upload_journal import UploadJournal, DATA_DIR
+from upload_scheduler import (TokenBucket, SessionStore, INITIAL_CHUNK, thread_service, run_uploads,
+                              session_key, resumable_execute, endpoint_request)
 
 SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
+# Legacy name-keyed tracker, only read to import old uploads into the journal
 UPLOADED_TRACKER = "uploaded.json"
+UPLOAD_SESSIONS = os.path.join(DATA_DIR, "upload_sessions.json")
 
 
-def get_authenticated_service():
+def get_authenticated_service(api_endpoint=None):
+    # A local stand-in endpoint needs no OAuth
+    if api_endpoint:
+        return build("youtube", "v3", credentials=AnonymousCredentials(),
+                     client_options={"api_endpoint": api_endpoint}, static_discovery=True,
+                     requestBuilder=endpoint_request(api_endpoint))
+
     creds = None
     if os.path.exists("token.json"):
         creds = Credentials.from_authorized_user_file("token.json", SCOPES)
@@ -38,7 +49,7 @@ def get_tags_from_folder(folder_name):
     return ["Podcast", "Shorts"]
 
 
-def upload_video(youtube, video_path, title, description, tags):
+def upload_video(youtube, video_path, title, description, tags, publish_at=None, sessions=None):
     if not title.strip():
         print(f"[!] Skipping upload: Empty title for {video_path}")
         return None
@@ -54,11 +65,18 @@ def upload_video(youtube, video_path, title, description, tags):
             "privacyStatus": "public"
         }
     }
+    # Scheduled videos stay private until YouTube publishes them at publish_at
+    if publish_at:
+        request_body["status"] = {"privacyStatus": "private", "publishAt": publish_at}
 
-    media = MediaFileUpload(video_path, mimetype="video/*", resumable=True)
+    media = MediaFileUpload(video_path, mimetype="video/*", chunksize=INITIAL_CHUNK, resumable=True)
     request = youtube.videos().insert(part="snippet,status", body=request_body, media_body=media)
-    response = request.execute()
-    print(f"[✓] Uploaded: {title}\n    → https://youtu.be/{response['id']}")
+    if sessions is None:
+        response = request.execute()
+    else:
+        response = resumable_execute(request, media, session_key(video_path), sessions)
+    when = f" (publishes {publish_at})" if publish_at else ""
+    print(f"[✓] Uploaded: {title}{when}\n    → https://youtu.be/{response['id']}")
     return response['id']
 
 
@@ -69,14 +87,19 @@ def load_uploaded_tracker():
     return {}
 
 
-def save_uploaded_tracker(tracker):
-    with open(UPLOADED_TRACKER, "w") as f:
-        json.dump(tracker, f, indent=2)
-
-
-def main(folder_path):
-    youtube = get_authenticated_service()
-    uploaded = load_uploaded_tracker()
+def main(folder_path, in_flight=2, publish_interval=300, burst=1, api_endpoint=None, bucket=None,
+         legacy_folder=None):
+    # Authenticate once up front so worker threads only reload token.json
+    get_authenticated_service(api_endpoint)
+    journal = UploadJournal()
+    # uploaded.json only records bare names, so it is trusted for the folder the user names
+    legacy_uploaded = load_uploaded_tracker()
+    legacy_folder = os.path.abspath(legacy_folder) if legacy_folder else None
+    # A long-running caller passes its own bucket so the cadence carries across calls
+    bucket = bucket or TokenBucket(publish_interval, burst)
+    sessions = SessionStore(UPLOAD_SESSIONS)
+    jobs = []
+    queued = set()
 
     if os.path.exists(os.path.join(folder_path, "titles.json")):
         folder_paths = [folder_path]
@@ -106,28 +129,66 @@ def main(folder_path):
         for video_file, title in titles.items():
             video_path = os.path.join(dir_path, video_file)
 
-            # Skip already uploaded
-            if video_file in uploaded:
+            if not os.path.exists(video_path):
+                print(f"[!] Video not found: {video_path}")
+                continue
+
+            # Skip already uploaded, wherever the same file was uploaded from
+            fingerprint = journal.fingerprint(video_path)
+            entry = journal.get(fingerprint)
+            if entry is None and video_file in legacy_uploaded:
+                if os.path.abspath(dir_path) != legacy_folder:
+                    print(f"[!] {UPLOADED_TRACKER} lists {video_file}, but not for which folder; check "
+                          f"{video_path} and rerun with --legacy_folder {dir_path} if it was uploaded, "
+                          f"or remove the entry")
+                    continue
+                journal.mark(fingerprint, "done", path=video_path, video_id=legacy_uploaded[video_file])
+                entry = journal.get(fingerprint)
+            if entry and entry["state"] == "done" or fingerprint in queued:
                 print(f"[⏩] Already uploaded: {video_file}")
                 continue
 
-            if not os.path.exists(video_path):
-                print(f"[!] Video not found: {video_path}")
+            if not title.strip():
+                print(f"[!] Skipping upload: Empty title for {video_path}")
                 continue
 
-            try:
-                video_id = upload_video(youtube, video_path, title, description, tags)
-                if video_id:
-                    uploaded[video_file] = video_id
-                    save_uploaded_tracker(uploaded)
-                    print("[⏳] Waiting 5 minutes before next upload...")
-                    time.sleep(300)  # 5 minutes
-            except Exception as e:
-                print(f"[❌] Upload failed for {video_file}: {e}")
+            journal.mark(fingerprint, "queued", path=video_path)
+            queued.add(fingerprint)
+            jobs.append((fingerprint, video_file, video_path, title, description, tags))
+
+    # Transfers run concurrently; the token bucket only spaces out publish times
+    def upload(job):
+        fingerprint, video_file, video_path, title, description, tags = job
+        journal.mark(fingerprint, "uploading")
+        youtube = thread_service(lambda: get_authenticated_service(api_endpoint))
+        return upload_video(youtube, video_path, title, description, tags,
+                            publish_at=bucket.publish_at(), sessions=sessions)
+
+    print(f"[+] Uploading {len(jobs)} videos, {in_flight} at a time")
+    for job, video_id, error in run_uploads(jobs, upload, in_flight):
+        fingerprint, video_file = job[:2]
+        if error:
+            print(f"[❌] Upload failed for {video_file}: {error}")
+            journal.mark(fingerprint, "failed", error=str(error))
+        elif video_id:
+            journal.mark(fingerprint, "done", video_id=video_id)
+        else:
+            journal.mark(fingerprint, "failed", error="Upload skipped")
+    journal.close()
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python youtube_uploader.py /path/to/Shorts")
-        sys.exit(1)
-    main(sys.argv[1])
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Upload a folder of videos with titles.json to YouTube.")
+    parser.add_argument("folder", help="Folder with titles.json, or a folder of such folders.")
+    parser.add_argument("--in_flight", type=int, default=2, help="Uploads transferring at the same time.")
+    parser.add_argument("--publish_interval", type=float, default=300,
+                        help="Seconds between publish times; later videos are scheduled with publishAt.")
+    parser.add_argument("--burst", type=int, default=1, help="Videos that may be published back to back.")
+    parser.add_argument("--api_endpoint", default=None,
+                        help="Send requests to this endpoint instead of YouTube, e.g. a local test server.")
+    parser.add_argument("--legacy_folder", default=None,
+                        help=f"Folder the names in {UPLOADED_TRACKER} were uploaded from; they are imported "
+                             "into the journal as done for that folder only.")
+    args = parser.parse_args()
+    main(args.folder, in_flight=args.in_flight, publish_interval=args.publish_interval,
+         burst=args.burst, api_endpoint=args.api_endpoint, legacy_folder=args.legacy_folder)
\ No newline at end of file